@@ -0,0 +1,160 @@
+"""
+Measures what ``@profiling`` adds to a call, in nanoseconds, for an empty
+function under each configuration, against the same function undecorated.
+
+    python -m benchmarks.overhead                       # print a table
+    python -m benchmarks.overhead --save baseline.json  # record a baseline
+    python -m benchmarks.overhead --compare baseline.json --threshold 0.25
+
+With ``--compare`` the exit status is 1 if any configuration's overhead
+grew by more than ``threshold`` (as a fraction) over the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.time_logger import Registry, profiling
+
+# Overheads below this many ns are within timer noise; differences there are
+# never reported as regressions.
+NOISE_NS = 20.0
+
+
+def _logger(name: str, level: int) -> logging.Logger:
+    logger = logging.getLogger(f"time_logger.benchmark.{name}")
+    logger.propagate = False
+    logger.setLevel(level)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+    return logger
+
+
+def _configurations() -> Dict[str, dict]:
+    logger = _logger("enabled", logging.INFO)
+    return {
+        "default": {"logger": logger},
+        "log_start": {"logger": logger, "log_start": True},
+        "log_variables": {"logger": logger, "log_variables": ["a"]},
+        "log_all_args": {"logger": logger, "log_all_args": True},
+        "custom_message": {
+            "logger": logger,
+            "custom_message": "{func} a={a} took {elapsed_ms:.3f} ms",
+        },
+        "disabled_level": {
+            "logger": _logger("disabled", logging.WARNING),
+            "level": logging.INFO,
+        },
+        "aggregate": {"aggregate": Registry()},
+        "every_n": {"logger": logger, "every_n": 1000},
+        "disabled": {"logger": logger, "enabled": False},
+    }
+
+
+def _time_sync(function: Callable, number: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            function(1, b=2)
+        best = min(best, time.perf_counter_ns() - started)
+    return best / number
+
+
+def _time_async(function: Callable, number: int, repeat: int) -> float:
+    async def loop() -> int:
+        started = time.perf_counter_ns()
+        for _ in range(number):
+            await function(1, b=2)
+        return time.perf_counter_ns() - started
+
+    return min(asyncio.run(loop()) for _ in range(repeat)) / number
+
+
+def run(number: int = 20000, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """ns per call and overhead (ns over undecorated) of each configuration."""
+
+    def empty(a, b=None):
+        pass
+
+    async def empty_async(a, b=None):
+        pass
+
+    baseline = _time_sync(empty, number, repeat)
+    results = {"undecorated": {"ns_per_call": baseline, "overhead_ns": 0.0}}
+    for name, options in _configurations().items():
+        ns = _time_sync(profiling(**options)(empty), number, repeat)
+        results[name] = {"ns_per_call": ns, "overhead_ns": ns - baseline}
+
+    async_baseline = _time_async(empty_async, number, repeat)
+    results["undecorated_async"] = {
+        "ns_per_call": async_baseline,
+        "overhead_ns": 0.0,
+    }
+    decorated = profiling(logger=_logger("enabled", logging.INFO))(empty_async)
+    ns = _time_async(decorated, number, repeat)
+    results["async"] = {"ns_per_call": ns, "overhead_ns": ns - async_baseline}
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float = 0.25,
+) -> List[str]:
+    """The configurations whose overhead regressed beyond ``threshold``."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        allowed = max(before["overhead_ns"], NOISE_NS) * (1 + threshold)
+        if result["overhead_ns"] > allowed:
+            regressions.append(
+                f"{name}: {result['overhead_ns']:.0f} ns overhead, "
+                f"baseline {before['overhead_ns']:.0f} ns"
+            )
+    return regressions
+
+
+def format_table(results: Dict[str, Dict[str, float]]) -> str:
+    width = max(len(name) for name in results)
+    lines = [f"{'configuration':<{width}} {'ns/call':>10} {'overhead':>10}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<{width}} {result['ns_per_call']:>10.0f} "
+            f"{result['overhead_ns']:>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    options = parser.parse_args(argv)
+
+    results = run(options.number, options.repeat)
+    print(format_table(results))
+    if options.save:
+        with open(options.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            regressions = compare(results, json.load(file), options.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
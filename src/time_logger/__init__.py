@@ -1,5 +1,41 @@
-from .profile import profiling
+from .exposition import exposition, start_http_server
+from .instrument import instrument_class, instrument_module, uninstrument
+from .profile import Span, profiling, span
+from .render import ArgumentRenderer
+from .scheduler import Reporter, start_reporting
+from .sinks import AsyncSink, BinarySink, JsonLinesSink, Sink, read_binary
+from .startup import profile_imports
+from .stats import Registry, collect, report, spool_at_exit, stats
+from .switch import disable, enable, is_enabled
+from .tree import CallTree, folded_stacks, write_folded
 
 __all__ = [
-    "profiling"
-]
\ No newline at end of file
+    "profiling",
+    "ArgumentRenderer",
+    "AsyncSink",
+    "BinarySink",
+    "CallTree",
+    "JsonLinesSink",
+    "Registry",
+    "Reporter",
+    "Sink",
+    "Span",
+    "collect",
+    "disable",
+    "enable",
+    "exposition",
+    "folded_stacks",
+    "instrument_class",
+    "instrument_module",
+    "is_enabled",
+    "profile_imports",
+    "read_binary",
+    "report",
+    "span",
+    "spool_at_exit",
+    "start_http_server",
+    "start_reporting",
+    "stats",
+    "uninstrument",
+    "write_folded",
+]
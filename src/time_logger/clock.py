@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Union
+
+
+class Clock(NamedTuple):
+    name: str
+    read: Callable[[], Union[int, float]]
+    scale: float  # seconds per tick
+
+
+CLOCKS = (
+    "perf_counter",
+    "perf_counter_ns",
+    "process_time_ns",
+    "thread_time_ns",
+    "monotonic_ns",
+)
+
+_overheads: Dict[str, float] = {}
+_overheads_lock = threading.Lock()
+
+
+def get_clock(name: str = "perf_counter") -> Clock:
+    """
+    Look up a clock by name. ``perf_counter`` reads float seconds; the
+    ``*_ns`` clocks read integer nanoseconds, so short intervals are exact.
+    ``process_time_ns`` and ``thread_time_ns`` measure CPU time rather than
+    wall time.
+    """
+    if name not in CLOCKS:
+        raise ValueError(f"clock must be one of {CLOCKS}, got {name!r}")
+    read = getattr(time, name)
+    return Clock(name, read, 1.0 if name == "perf_counter" else 1e-9)
+
+
+def start_stamp(clock: Clock) -> Optional[Callable[[], float]]:
+    """
+    The clock to read call start times from, in perf_counter seconds, when
+    ``clock`` cannot provide them. Start times always share perf_counter's
+    base, so they can be lined up (and turned into epoch times) whichever
+    clock measures the durations. None for the perf_counter clocks.
+    """
+    if clock.name in ("perf_counter", "perf_counter_ns"):
+        return None
+    return time.perf_counter
+
+
+def _empty() -> None:
+    pass
+
+
+def calibrate(clock: Clock, rounds: int = 2000) -> float:
+    """
+    Measure how long an empty call between two clock reads takes, which is
+    the floor of every duration the decorator reports (in secs, median of
+    ``rounds`` samples).
+    """
+    read = clock.read
+    samples = []
+    for _ in range(rounds):
+        start = read()
+        _empty()
+        samples.append(read() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * clock.scale
+
+
+def overhead(clock: Clock) -> float:
+    """``calibrate(clock)``, measured once per clock and then cached."""
+    value = _overheads.get(clock.name)
+    if value is None:
+        with _overheads_lock:
+            value = _overheads.get(clock.name)
+            if value is None:
+                value = _overheads[clock.name] = calibrate(clock)
+    return value
+
+
+def format_duration(seconds: float) -> str:
+    """Format ``seconds`` in whichever of ns, µs, ms or s reads best."""
+    magnitude = abs(seconds)
+    if magnitude < 1e-6:
+        return f"{seconds * 1e9:.0f} ns"
+    if magnitude < 1e-3:
+        return f"{seconds * 1e6:.2f} µs"
+    if magnitude < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.4f} s"
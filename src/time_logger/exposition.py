@@ -0,0 +1,158 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .stats import Accumulator, Registry
+from .stats import registry as default_registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the exported latency histogram buckets.
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+
+
+def _cumulative(
+    accumulator: Accumulator, bounds: Sequence[float]
+) -> List[Tuple[float, int]]:
+    """
+    Cumulative counts at each bound, from the accumulator's log-bucketed
+    histogram. A log bucket counts towards a bound when its geometric
+    midpoint is within it, so counts are off by at most one log bucket.
+    """
+    histogram = accumulator.histogram
+    counts = []
+    seen = 0
+    index = 0
+    size = len(histogram.counts)
+    for bound in bounds:
+        while index < size and (
+            histogram.min_value * histogram.growth ** (index + 0.5) <= bound
+        ):
+            seen += histogram.counts[index]
+            index += 1
+        counts.append((bound, seen))
+    return counts
+
+
+def exposition(
+    registry: Optional[Registry] = None,
+    prefix: str = "time_logger",
+    buckets: Sequence[float] = BUCKETS,
+) -> str:
+    """
+    The aggregated statistics of ``registry`` (the one behind
+    ``aggregate=True`` by default) in the Prometheus text format: a calls
+    counter, a failed calls counter per outcome and a latency histogram of
+    successful calls, all labelled with the function's qualified name and
+    its ``group_by`` labels.
+    """
+    registry = registry or default_registry
+    calls = f"{prefix}_calls_total"
+    errors = f"{prefix}_errors_total"
+    duration = f"{prefix}_call_duration_seconds"
+    lines = [
+        f"# HELP {calls} Calls of profiled functions.",
+        f"# TYPE {calls} counter",
+    ]
+    error_lines = [
+        f"# HELP {errors} Calls that raised, by outcome.",
+        f"# TYPE {errors} counter",
+    ]
+    duration_lines = [
+        f"# HELP {duration} Duration of successful calls.",
+        f"# TYPE {duration} histogram",
+    ]
+    for _name, function_stats in sorted(registry.functions().items()):
+        merged = function_stats.merged()
+        outcomes = merged.outcomes
+        failed = sum(outcomes.values())
+        if not merged.count and not failed:
+            continue
+        labels = {"function": function_stats.function}
+        labels.update(function_stats.labels)
+        text = _labels(labels)
+        lines.append(f"{calls}{{{text}}} {merged.count + failed}")
+        for outcome, count in sorted(outcomes.items()):
+            error_labels = _labels({**labels, "outcome": outcome})
+            error_lines.append(f"{errors}{{{error_labels}}} {count}")
+        for bound, count in _cumulative(merged, buckets):
+            duration_lines.append(
+                f'{duration}_bucket{{{text},le="{bound:g}"}} {count}'
+            )
+        duration_lines.append(
+            f'{duration}_bucket{{{text},le="+Inf"}} {merged.count}'
+        )
+        duration_lines.append(f"{duration}_sum{{{text}}} {merged.total!r}")
+        duration_lines.append(f"{duration}_count{{{text}}} {merged.count}")
+    return "\n".join(lines + error_lines + duration_lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Optional[Registry] = None
+    prefix = "time_logger"
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = exposition(self.registry, self.prefix).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # Don't write a line to stderr for every scrape.
+
+
+def start_http_server(
+    port: int = 9464,
+    address: str = "",
+    registry: Optional[Registry] = None,
+    prefix: str = "time_logger",
+) -> ThreadingHTTPServer:
+    """
+    Serve ``exposition()`` at ``/metrics`` from a daemon thread. Pass
+    ``port=0`` to pick a free port (see ``server.server_address``) and call
+    ``server.shutdown()`` to stop it.
+    """
+    handler = type(
+        "MetricsHandler",
+        (_MetricsHandler,),
+        {"registry": registry, "prefix": prefix},
+    )
+    server = ThreadingHTTPServer((address, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="time_logger-metrics", daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,188 @@
+import inspect
+import threading
+import weakref
+from fnmatch import fnmatchcase
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .profile import profiling
+
+Patterns = Union[None, str, Iterable[str]]
+
+# What instrument_* replaced, per class or module: name -> (original,
+# replacement), so that uninstrument() only restores attributes that still
+# hold our replacement.
+_instrumented: "weakref.WeakKeyDictionary[Any, Dict[str, Tuple[Any, Any]]]"
+_instrumented = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _patterns(patterns: Patterns) -> Optional[List[str]]:
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        return [patterns]
+    return list(patterns)
+
+
+def _selected(
+    name: str, include: Optional[List[str]], exclude: Optional[List[str]]
+) -> bool:
+    if include is not None and not any(
+        fnmatchcase(name, pattern) for pattern in include
+    ):
+        return False
+    return not (
+        exclude and any(fnmatchcase(name, pattern) for pattern in exclude)
+    )
+
+
+def _is_profiled(function: Any) -> bool:
+    return hasattr(function, "profiling_switch")
+
+
+def _wrap_attribute(attribute: Any, decorate: Callable) -> Any:
+    """
+    The instrumented version of a class or module attribute, or None when
+    it is not something we profile. Static methods, class methods and
+    properties are unwrapped, their functions profiled and re-wrapped.
+    """
+    if isinstance(attribute, staticmethod):
+        function = attribute.__func__
+        if inspect.isfunction(function) and not _is_profiled(function):
+            return staticmethod(decorate(function))
+    elif isinstance(attribute, classmethod):
+        function = attribute.__func__
+        if inspect.isfunction(function) and not _is_profiled(function):
+            return classmethod(decorate(function))
+    elif isinstance(attribute, property):
+        accessors = [attribute.fget, attribute.fset, attribute.fdel]
+        if any(
+            inspect.isfunction(accessor) and not _is_profiled(accessor)
+            for accessor in accessors
+        ):
+            return type(attribute)(
+                *[
+                    (
+                        decorate(accessor)
+                        if inspect.isfunction(accessor)
+                        and not _is_profiled(accessor)
+                        else accessor
+                    )
+                    for accessor in accessors
+                ],
+                attribute.__doc__,
+            )
+    elif inspect.isfunction(attribute) and not _is_profiled(attribute):
+        return decorate(attribute)
+    return None
+
+
+def _replace(target: Any, name: str, original: Any, replacement: Any) -> None:
+    setattr(target, name, replacement)
+    with _lock:
+        _instrumented.setdefault(target, {})[name] = (original, replacement)
+
+
+def instrument_class(
+    cls: type,
+    include: Patterns = None,
+    exclude: Patterns = None,
+    **options: Any,
+) -> List[str]:
+    """
+    Profile every method of ``cls`` (including static methods, class methods
+    and property accessors) defined in its own body, with ``profiling``
+    ``options``. ``include`` and ``exclude`` are glob patterns (or lists of
+    them) matched against method names; dunder methods are only profiled
+    when ``include`` names them exactly, and methods that are already
+    profiled are left alone. Returns the names of the instrumented methods.
+    """
+    return _instrument_class(
+        cls, _patterns(include), _patterns(exclude), "", options
+    )
+
+
+def _instrument_class(
+    cls: type,
+    include: Optional[List[str]],
+    exclude: Optional[List[str]],
+    prefix: str,
+    options: Dict[str, Any],
+) -> List[str]:
+    decorate = profiling(**options)
+    names = []
+    for name, attribute in list(vars(cls).items()):
+        qualified = prefix + name
+        if name.startswith("__") and name.endswith("__"):
+            if include is None or qualified not in include:
+                continue
+        if not _selected(qualified, include, exclude):
+            continue
+        replacement = _wrap_attribute(attribute, decorate)
+        if replacement is not None:
+            _replace(cls, name, attribute, replacement)
+            names.append(qualified)
+    return names
+
+
+def instrument_module(
+    module: ModuleType,
+    include: Patterns = None,
+    exclude: Patterns = None,
+    classes: bool = True,
+    **options: Any,
+) -> List[str]:
+    """
+    Profile every function defined in ``module`` and, with ``classes``,
+    every method of the classes defined there, with ``profiling``
+    ``options``. Patterns are matched against ``"function"`` and
+    ``"Class.method"`` names. Only the module's attributes are replaced:
+    references taken earlier with ``from module import function`` keep
+    calling the original. Returns the instrumented names.
+    """
+    include, exclude = _patterns(include), _patterns(exclude)
+    decorate = profiling(**options)
+    names = []
+    for name, attribute in list(vars(module).items()):
+        if name.startswith("__"):
+            continue
+        if getattr(attribute, "__module__", None) != module.__name__:
+            continue  # imported from elsewhere
+        if inspect.isclass(attribute):
+            if classes:
+                names += _instrument_class(
+                    attribute, include, exclude, f"{name}.", options
+                )
+            continue
+        if not _selected(name, include, exclude):
+            continue
+        replacement = _wrap_attribute(attribute, decorate)
+        if replacement is not None:
+            _replace(module, name, attribute, replacement)
+            names.append(name)
+    return names
+
+
+def uninstrument(target: Union[type, ModuleType]) -> List[str]:
+    """
+    Undo ``instrument_class`` or ``instrument_module`` (including the
+    classes it instrumented). Attributes that were reassigned since are
+    left as they are. Returns the names that were restored.
+    """
+    with _lock:
+        replaced = _instrumented.pop(target, {})
+    names = []
+    for name, (original, replacement) in replaced.items():
+        if vars(target).get(name) is replacement:
+            setattr(target, name, original)
+            names.append(name)
+    if isinstance(target, ModuleType):
+        for name, attribute in list(vars(target).items()):
+            if (
+                inspect.isclass(attribute)
+                and attribute in _instrumented
+                and attribute.__module__ == target.__name__
+            ):
+                names += [f"{name}.{n}" for n in uninstrument(attribute)]
+    return names
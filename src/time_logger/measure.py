@@ -0,0 +1,307 @@
+import threading
+import time
+import tracemalloc
+import warnings
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+MEASURES = ("wall", "cpu", "thread")
+
+
+class Measures:
+    """
+    Extra per-call measurements requested through ``profiling(measure=...)``:
+    "cpu" is process CPU time and "thread" is the calling thread's CPU time.
+    Either one also yields "wait", the wall time not spent on CPU (using
+    thread time when both are measured, since process time includes other
+    threads).
+    """
+
+    def __init__(self, measure: Iterable[str]) -> None:
+        measure = tuple(measure)
+        unknown = [name for name in measure if name not in MEASURES]
+        if unknown:
+            raise ValueError(
+                f"measure must only contain {MEASURES}, got {unknown!r}"
+            )
+        self.cpu = "cpu" in measure
+        self.thread = "thread" in measure
+
+    @property
+    def enabled(self) -> bool:
+        return self.cpu or self.thread
+
+    def start(self) -> Tuple[int, int]:
+        return (
+            time.process_time_ns() if self.cpu else 0,
+            time.thread_time_ns() if self.thread else 0,
+        )
+
+    def stop(self, started: Tuple[int, int]) -> Dict[str, float]:
+        """The CPU times since ``started``; read before the wall clock."""
+        cpu_started, thread_started = started
+        results = {}
+        if self.cpu:
+            results["cpu"] = (time.process_time_ns() - cpu_started) * 1e-9
+        if self.thread:
+            results["thread"] = (time.thread_time_ns() - thread_started) * 1e-9
+        return results
+
+    def results(
+        self, results: Dict[str, float], run_time: float
+    ) -> Dict[str, float]:
+        """Add the wait time of a call that took ``run_time`` to ``stop``'s."""
+        on_cpu = results["thread"] if self.thread else results["cpu"]
+        results["wait"] = max(run_time - on_cpu, 0.0)
+        return results
+
+    def wrap(self, coroutine: Coroutine) -> "SteppedCoroutine":
+        return SteppedCoroutine(self, coroutine)
+
+
+class SteppedCoroutine:
+    """
+    Awaits ``coroutine`` one step at a time, so that time spent running
+    (between resumption and the next suspension) is measured separately from
+    time spent suspended at ``await``. CPU times are summed over the running
+    steps only, leaving out other tasks that run on the same thread.
+    """
+
+    def __init__(self, measures: Measures, coroutine: Coroutine) -> None:
+        self.measures = measures
+        self.coroutine = coroutine
+        self.running = 0.0
+        self.cpu = 0
+        self.thread = 0
+
+    def _step(self, iterator, value: Any, error: Optional[BaseException]):
+        measures = self.measures
+        started = time.perf_counter()
+        cpu_started = time.process_time_ns() if measures.cpu else 0
+        thread_started = time.thread_time_ns() if measures.thread else 0
+        try:
+            if error is None:
+                return iterator.send(value)
+            return iterator.throw(error)
+        finally:
+            if measures.cpu:
+                self.cpu += time.process_time_ns() - cpu_started
+            if measures.thread:
+                self.thread += time.thread_time_ns() - thread_started
+            self.running += time.perf_counter() - started
+
+    def __await__(self):
+        iterator = self.coroutine.__await__()
+        value, error = None, None
+        while True:
+            try:
+                yielded = self._step(iterator, value, error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                iterator.close()
+                raise
+            except BaseException as exc:  # noqa: B036 - thrown in
+                value, error = None, exc
+
+    def results(self, run_time: float) -> Dict[str, float]:
+        results = {}
+        if self.measures.cpu:
+            results["cpu"] = self.cpu * 1e-9
+        if self.measures.thread:
+            results["thread"] = self.thread * 1e-9
+        on_cpu = results["thread"] if self.measures.thread else results["cpu"]
+        results["wait"] = max(run_time - on_cpu, 0.0)
+        results["running"] = self.running
+        results["suspended"] = max(run_time - self.running, 0.0)
+        return results
+
+
+class GeneratorSteps:
+    """
+    Times each resumption of a generator (or async generator) separately,
+    so that time the consumer holds control between items is left out of
+    the generator's active time. Also counts items and records the time to
+    the first one.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[], float],
+        scale: float,
+        measures: Optional[Measures] = None,
+        item_stats: Any = None,
+    ) -> None:
+        self.read = read
+        self.scale = scale
+        self.measures = measures
+        self.item_stats = item_stats
+        self.items = 0
+        self.active = 0.0
+        self.first_item: Optional[float] = None
+        self.cpu = 0
+        self.thread = 0
+
+    def start(self) -> Tuple[float, Tuple[int, int]]:
+        measures = self.measures
+        return self.read(), measures.start() if measures else (0, 0)
+
+    def stop(
+        self, started: Tuple[float, Tuple[int, int]], produced: bool
+    ) -> None:
+        measures = self.measures
+        if measures:
+            cpu_started, thread_started = started[1]
+            if measures.cpu:
+                self.cpu += time.process_time_ns() - cpu_started
+            if measures.thread:
+                self.thread += time.thread_time_ns() - thread_started
+        step = (self.read() - started[0]) * self.scale
+        self.active += step
+        if produced:
+            self.items += 1
+            if self.first_item is None:
+                self.first_item = self.active
+            if self.item_stats is not None:
+                self.item_stats.add(step)
+
+    def results(self, elapsed: float) -> Dict[str, float]:
+        """Measures of a generator that ran for ``elapsed`` seconds in all."""
+        results = {}
+        if self.first_item is not None:
+            results["first_item"] = self.first_item
+        results["consumer"] = max(elapsed - self.active, 0.0)
+        if self.measures:
+            if self.measures.cpu:
+                results["cpu"] = self.cpu * 1e-9
+            if self.measures.thread:
+                results["thread"] = self.thread * 1e-9
+            on_cpu = (
+                results["thread"] if self.measures.thread else results["cpu"]
+            )
+            results["wait"] = max(self.active - on_cpu, 0.0)
+        return results
+
+
+# Python 3.8 has no way to reset the traced peak; peaks are not reported.
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+
+class _MemoryFrame:
+    __slots__ = ("start", "peak", "snapshot")
+
+    def __init__(self, start: int, snapshot: Any) -> None:
+        self.start = start
+        self.peak = start
+        self.snapshot = snapshot
+
+
+class MemoryTracker:
+    """
+    Net and peak memory allocated during each call, from ``tracemalloc``,
+    which is started by the first tracked call if it is not tracing yet
+    and keeps tracing (and slowing down every allocation) until
+    ``tracemalloc.stop()`` is called. ``tracemalloc`` has a
+    single, process-wide peak, which every tracked call that is running
+    shares: a call's figures include what overlapping calls (nested,
+    other threads or other tasks) allocated in the meantime.
+
+    With ``top``, the ``top`` source lines that allocated the most are
+    reported for calls that allocated more than ``threshold`` bytes. That
+    takes a snapshot before every call, which is slow.
+
+    Peaks need ``tracemalloc.reset_peak`` (Python 3.9+). If tracing fails,
+    e.g. because someone stopped tracemalloc, a warning is issued and the
+    call is reported without memory figures.
+    """
+
+    def __init__(self, top: int = 0, threshold: int = 0) -> None:
+        self.top = top
+        self.threshold = threshold
+        self._active: Set[_MemoryFrame] = set()
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def start(self) -> Optional[_MemoryFrame]:
+        try:
+            return self._start()
+        except Exception as error:
+            self._warn(error)
+            return None
+
+    def stop(self, frame: Optional[_MemoryFrame]) -> Optional[Dict[str, Any]]:
+        if frame is None:
+            return None
+        try:
+            return self._stop(frame)
+        except Exception as error:
+            self._warn(error)
+            return None
+
+    def _warn(self, error: Exception) -> None:
+        if not self._warned:
+            self._warned = True
+            warnings.warn(
+                f"track_memory failed: {error!r}", RuntimeWarning, stacklevel=3
+            )
+
+    def _start(self) -> _MemoryFrame:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        frame = _MemoryFrame(
+            0, tracemalloc.take_snapshot() if self.top else None
+        )
+        with self._lock:
+            # Resetting the peak below hides it from calls already running,
+            # so fold it into them first.
+            peak = tracemalloc.get_traced_memory()[1]
+            for active in self._active:
+                active.peak = max(active.peak, peak)
+            self._active.add(frame)
+            # Read the baseline last, so our own bookkeeping is not counted.
+            if _reset_peak is not None:
+                _reset_peak()
+            frame.start = frame.peak = tracemalloc.get_traced_memory()[0]
+        return frame
+
+    def _stop(self, frame: _MemoryFrame) -> Dict[str, Any]:
+        with self._lock:
+            self._active.discard(frame)
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc was stopped during the call")
+            current, peak = tracemalloc.get_traced_memory()
+        frame.peak = max(frame.peak, peak)
+        results: Dict[str, Any] = {"allocated": current - frame.start}
+        if _reset_peak is not None:
+            results["peak"] = frame.peak - frame.start
+        if frame.snapshot is not None and results["allocated"] > (
+            self.threshold
+        ):
+            statistics = tracemalloc.take_snapshot().compare_to(
+                frame.snapshot, "lineno"
+            )
+            results["top"] = [
+                str(statistic) for statistic in statistics[: self.top]
+            ]
+        frame.snapshot = None
+        return results
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return (
+                f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            )
+        size /= 1024
+    return f"{size:.1f} GiB"
@@ -1,118 +1,715 @@
+import sys
+import threading
 import time
-from functools import wraps
-from inspect import iscoroutinefunction, signature
-from logging import Logger
-from typing import Callable, Optional, List, Dict
-import re
 import traceback
+import warnings
+from asyncio import CancelledError
+from functools import wraps
+from inspect import (
+    Parameter,
+    isasyncgenfunction,
+    iscoroutinefunction,
+    isgeneratorfunction,
+    signature,
+)
+from logging import INFO, Logger
+from types import FrameType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from . import sinks, stats, switch, tree
+from .clock import format_duration, get_clock, overhead, start_stamp
+from .measure import GeneratorSteps, Measures, MemoryTracker, format_bytes
+from .render import default_renderer
+from .sampling import make_sampler
+from .template import MessageTemplate, TemplateError
+from .threshold import Threshold
+
+_EMPTY = Parameter.empty
+
+# Kinds of argument lookups, resolved once per decorated function.
+_POSITIONAL = 0
+_VAR_POSITIONAL = 1
+_KEYWORD = 2
+_VAR_KEYWORD = 3
+
+ArgumentLookup = Tuple[str, int, Any, Any]
+
+# Outcome of a call that returned normally; failed calls are tagged with the
+# exception type name, or CANCELLED for asyncio cancellation.
+OK = "ok"
+CANCELLED = "cancelled"
+
+# Label values of calls beyond profiling(max_groups=...) distinct groups.
+OVERFLOW = "__overflow__"
+MAX_LABEL_LENGTH = 100
+_LABEL_TYPES = (str, int, float, bool, type(None))
+
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, CancelledError):
+        return CANCELLED
+    return type(error).__name__
+
+
+def _extract_variables(custom_message: Optional[str]) -> List[str]:
+    if not custom_message:
+        return []
+    try:
+        return MessageTemplate(custom_message).variables
+    except TemplateError:
+        return []
+
+
+def _parameters(function: Callable) -> Optional[List[Parameter]]:
+    try:
+        return list(signature(function).parameters.values())
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_module_name(function: Callable) -> str:
+    module = function.__module__
+    if module is None or module == str.__class__.__module__:
+        return ""
+    if module == "__main__":
+        return "main"
+    return module
+
+
+def _get_function_name(function: Callable) -> str:
+    qualname = getattr(function, "__qualname__", None)
+    if isinstance(qualname, str):
+        # Leave out the enclosing functions of nested functions and classes.
+        return qualname.rsplit("<locals>.", 1)[-1]
+    cls = (
+        function.__self__.__class__ if hasattr(function, "__self__") else None
+    )
+    return f"{cls.__name__}.{function.__name__}" if cls else function.__name__
+
+
+def _compile_argument_lookups(
+    function: Callable, names: Optional[List[str]]
+) -> List[ArgumentLookup]:
+    """
+    Translate argument names into (name, kind, position, default) lookups so
+    that values can be read straight out of ``args``/``kwargs`` on each call
+    instead of binding the signature. ``names=None`` means every parameter.
+    """
+    parameters = _parameters(function)
+    if parameters is None:
+        return []
+
+    named = frozenset(
+        p.name
+        for p in parameters
+        if p.kind not in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD)
+    )
+    lookups = []
+    for position, parameter in enumerate(parameters):
+        if names is not None and parameter.name not in names:
+            continue
+        if parameter.kind in (
+            Parameter.POSITIONAL_ONLY,
+            Parameter.POSITIONAL_OR_KEYWORD,
+        ):
+            lookup = (parameter.name, _POSITIONAL, position, parameter.default)
+        elif parameter.kind == Parameter.VAR_POSITIONAL:
+            lookup = (parameter.name, _VAR_POSITIONAL, position, _EMPTY)
+        elif parameter.kind == Parameter.KEYWORD_ONLY:
+            lookup = (parameter.name, _KEYWORD, position, parameter.default)
+        else:
+            lookup = (parameter.name, _VAR_KEYWORD, position, named)
+        lookups.append(lookup)
+
+    if names is not None:
+        order = {name: index for index, name in enumerate(names)}
+        lookups.sort(key=lambda lookup: order[lookup[0]])
+    return lookups
+
+
+def _resolve_arguments(
+    lookups: List[ArgumentLookup], args: tuple, kwargs: dict
+) -> Dict[str, Any]:
+    values = {}
+    for name, kind, position, default in lookups:
+        if kind == _POSITIONAL:
+            if position < len(args):
+                value = args[position]
+            elif name in kwargs:
+                value = kwargs[name]
+            elif default is not _EMPTY:
+                value = default
+            else:
+                continue
+        elif kind == _VAR_POSITIONAL:
+            value = args[position:]
+        elif kind == _KEYWORD:
+            value = kwargs.get(name, default)
+            if value is _EMPTY:
+                continue
+        else:
+            value = {k: v for k, v in kwargs.items() if k not in default}
+        values[name] = value
+    return values
+
+
+def _format_stack(frame: FrameType, limit: int = 20) -> str:
+    return "".join(
+        traceback.format_list(traceback.extract_stack(frame, limit))
+    )
+
+
+class Record:
+    """One profiled call (or call start), as handed to loggers and sinks."""
+
+    __slots__ = (
+        "site",
+        "action",
+        "args",
+        "kwargs",
+        "start",
+        "run_time",
+        "thread_id",
+        "parent",
+        "depth",
+        "self_time",
+        "measures",
+        "outcome",
+        "items",
+        "stack",
+        "memory",
+    )
 
-class Profiler:
     def __init__(
         self,
-        function: Callable,
+        site: "_CallSite",
+        action: str,
         args: tuple,
         kwargs: dict,
+        start: Optional[float] = None,
+        run_time: Optional[float] = None,
+        frame: Optional[tree.Frame] = None,
+        self_time: Optional[float] = None,
+        measures: Optional[Dict[str, float]] = None,
+        outcome: str = OK,
+        items: Optional[int] = None,
+        stack: Optional[str] = None,
+        memory: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.site = site
+        self.action = action
+        self.args = args
+        self.kwargs = kwargs
+        self.start = start
+        self.run_time = run_time
+        self.thread_id = threading.get_ident()
+        self.parent = None
+        self.depth = None
+        self.self_time = self_time
+        self.measures = measures
+        self.outcome = outcome
+        self.items = items
+        self.stack = stack
+        self.memory = memory
+        if frame is not None:
+            self.depth = frame.depth
+            if frame.parent is not None:
+                self.parent = frame.parent.name
+
+    @property
+    def name(self) -> str:
+        return self.site.full_name
+
+
+class _DeferredMessage:
+    """
+    A log message that is only rendered when a handler asks for it, so calls
+    filtered out by the logger never pay for ``repr()`` of their arguments.
+    """
+
+    __slots__ = ("record", "message")
+
+    def __init__(self, record: Record) -> None:
+        self.record = record
+        self.message = None
+
+    def __str__(self) -> str:
+        # Every handler formats the record, so only render the first time.
+        if self.message is None:
+            self.message = self.record.site.render(self.record)
+        return self.message
+
+
+class _CallSite:
+    """
+    Everything about a profiled function that does not depend on a single
+    call: its qualified name, the parsed message template and the argument
+    lookups. Built once when ``profiling()`` decorates the function.
+
+    Spans pass a ``name`` instead of a function; their keyword fields are
+    logged as-is.
+    """
+
+    def __init__(
+        self,
+        function: Optional[Callable],
         logger: Optional[Logger] = None,
         log_start: bool = True,
         log_variables: Optional[List[str]] = None,
         log_all_args: bool = False,
         custom_message: Optional[str] = None,
+        level: int = INFO,
+        aggregate: Union[bool, stats.Registry] = False,
+        async_sink: Union[bool, sinks.AsyncSink] = False,
+        call_tree: Union[bool, tree.CallTree] = False,
+        sink: Union[None, sinks.Sink, List[sinks.Sink]] = None,
+        units: str = "secs",
+        name: Optional[str] = None,
+        renderer: Optional[Callable[[Any], str]] = None,
+        threshold: Optional[Threshold] = None,
+        capture_stack: bool = False,
+        group_by: Optional[List[str]] = None,
+        max_groups: int = 100,
     ) -> None:
+        if units not in ("secs", "auto"):
+            raise ValueError(f"units must be 'secs' or 'auto', got {units!r}")
         self.function = function
-        self.args = args
-        self.kwargs = kwargs
+        self.units = units
+        self.renderer = renderer or default_renderer
         self.logger = logger
+        self.level = level
         self.log_start = log_start
         self.log_all_args = log_all_args
         self.custom_message = custom_message
-        self.log_variables = log_variables if log_variables is not None else self._extract_variables_from_custom_message()
-        self.start_time = 0.0
-        self.module_name = self._get_module_name()
+        self.template = None
+        self.template_lookups = None
+        if custom_message:
+            self._compile_template(custom_message, function, name)
+        self.log_variables = (
+            log_variables
+            if log_variables is not None
+            else _extract_variables(custom_message)
+        )
+        if function is None:
+            self.module_name = ""
+            self.function_name = self.full_name = self.display_name = name
+            self.lookups = None
+        else:
+            self.module_name = _get_module_name(function)
+            self.function_name = _get_function_name(function)
+            self.full_name = (
+                f"{self.module_name}.{self.function_name}"
+                if self.module_name
+                else self.function_name
+            )
+            self.display_name = f"{self.full_name}()"
+            self.lookups = _compile_argument_lookups(
+                function, None if log_all_args else self.log_variables
+            )
+        if aggregate is True:
+            aggregate = stats.registry
+        self.aggregate = aggregate or None
+        self.accumulator = None
+        if aggregate and not group_by:
+            self.accumulator = aggregate.get(self.full_name)
+        self.group_lookups = None
+        if group_by:
+            self._compile_groups(function, list(group_by), max_groups)
+        # Generators also get the distribution of their per-item times.
+        self.item_accumulator = None
+        if aggregate and (
+            isgeneratorfunction(function) or isasyncgenfunction(function)
+        ):
+            self.item_accumulator = aggregate.get(f"{self.full_name}[item]")
+        if async_sink is True:
+            async_sink = sinks.default_async_sink()
+        self.async_sink = async_sink or None
+        if call_tree is True:
+            call_tree = tree.call_tree
+        self.call_tree = call_tree or None
+        if isinstance(sink, sinks.Sink):
+            sink = [sink]
+        self.sinks = list(sink or [])
+        self.threshold = threshold
+        self.capture_stack = capture_stack
 
-    def _extract_variables_from_custom_message(self) -> List[str]:
-        if not self.custom_message:
-            return []
-        return re.findall(r'\{(\w+)\}', self.custom_message)
+    def _compile_groups(
+        self, function: Optional[Callable], group_by: List[str], limit: int
+    ) -> None:
+        """
+        Keep the aggregate statistics per combination of the ``group_by``
+        arguments' values, for at most ``limit`` combinations; calls with
+        further combinations are counted under the OVERFLOW label values.
+        """
+        if self.aggregate is None:
+            raise ValueError("group_by requires aggregate")
+        parameters = None if function is None else _parameters(function)
+        if parameters is not None and not any(
+            p.kind == Parameter.VAR_KEYWORD for p in parameters
+        ):
+            unknown = set(group_by) - {p.name for p in parameters}
+            if unknown:
+                raise ValueError(
+                    f"group_by names unknown argument(s) of "
+                    f"{self.full_name}: {', '.join(sorted(unknown))}"
+                )
+        self.group_by = group_by
+        self.group_lookups = _compile_argument_lookups(function, group_by)
+        self.max_groups = limit
+        self.groups: Dict[Tuple[str, ...], stats.FunctionStats] = {}
+        self.groups_lock = threading.Lock()
 
-    def _format_variables(self) -> Dict[str, str]:
-        func_signature = signature(self.function)
-        bound_args = func_signature.bind(*self.args, **self.kwargs)
-        bound_args.apply_defaults()
+    def group(self, args: tuple, kwargs: dict) -> stats.FunctionStats:
+        """The aggregate statistics for this call's group."""
+        try:
+            values = _resolve_arguments(self.group_lookups, args, kwargs)
+            key = tuple(
+                self._label(values.get(name, ""))[:MAX_LABEL_LENGTH]
+                for name in self.group_by
+            )
+        except Exception as error:
+            self.log_error(error)
+            key = (OVERFLOW,) * len(self.group_by)
+        accumulator = self.groups.get(key)
+        if accumulator is None:
+            with self.groups_lock:
+                accumulator = self.groups.get(key)
+                if accumulator is None:
+                    if len(self.groups) >= self.max_groups:
+                        key = (OVERFLOW,) * len(self.group_by)
+                    accumulator = self.groups.get(key)
+                    if accumulator is None:
+                        accumulator = self.groups[key] = self.aggregate.get(
+                            self.full_name, dict(zip(self.group_by, key))
+                        )
+        return accumulator
 
-        if self.log_all_args:
-            return {k: repr(v) for k, v in bound_args.arguments.items()}
+    def _label(self, value: Any) -> str:
+        # Scalars are used as they are; anything else goes through the
+        # bounded renderer rather than its own, possibly huge, ``__str__``.
+        if type(value) in _LABEL_TYPES:
+            return str(value)
+        return self.renderer(value)
 
-        return {
-            var_name: repr(bound_args.arguments[var_name])
-            for var_name in self.log_variables
-            if var_name in bound_args.arguments
+    def _compile_template(
+        self,
+        custom_message: str,
+        function: Optional[Callable],
+        name: Optional[str],
+    ) -> None:
+        """
+        Parse ``custom_message`` and check it against the function's
+        arguments. Problems are reported once, here, as a warning (turn it
+        into an error with the warnings filter) and the site then uses the
+        default message format.
+        """
+        try:
+            template = MessageTemplate(custom_message)
+            parameters = None if function is None else _parameters(function)
+            if parameters is not None:
+                template.validate(
+                    [p.name for p in parameters],
+                    accepts_any_keyword=any(
+                        p.kind == Parameter.VAR_KEYWORD for p in parameters
+                    ),
+                )
+        except TemplateError as error:
+            target = (
+                name
+                if function is None
+                else getattr(function, "__qualname__", repr(function))
+            )
+            warnings.warn(
+                f"custom_message of {target}: {error}; "
+                "using the default message format instead",
+                stacklevel=4,
+            )
+            return
+        self.template = template
+        if function is not None:
+            self.template_lookups = _compile_argument_lookups(
+                function, list(dict.fromkeys(template.fields))
+            )
+
+    def _render_template(self, record: Record) -> Optional[str]:
+        if self.template_lookups is None:
+            values = record.kwargs
+        else:
+            values = _resolve_arguments(
+                self.template_lookups, record.args, record.kwargs
+            )
+        run_time = record.run_time
+        builtins = {
+            "func": self.full_name,
+            "action": record.action,
+            "outcome": record.outcome,
+            "thread": record.thread_id,
+            "elapsed": run_time,
+            "elapsed_ms": None if run_time is None else run_time * 1e3,
+            "elapsed_us": None if run_time is None else run_time * 1e6,
+            "elapsed_ns": None if run_time is None else round(run_time * 1e9),
         }
+        try:
+            return self.template.render(values, builtins, self.renderer)
+        except (LookupError, AttributeError, TypeError, ValueError):
+            return None  # Fall back to default format
 
-    def _get_module_name(self) -> str:
-        module = self.function.__module__
-        if module is None or module == str.__class__.__module__:
-            return ""
-        if module == "__main__":
-            return "main"
-        return module
+    def format_variables(self, args: tuple, kwargs: dict) -> Dict[str, str]:
+        render = self.renderer
+        if self.lookups is None:
+            return {k: render(v) for k, v in kwargs.items()}
+        return {
+            k: render(v)
+            for k, v in _resolve_arguments(self.lookups, args, kwargs).items()
+        }
 
-    def _get_function_name(self) -> str:
-        cls = (
-            self.function.__self__.__class__
-            if hasattr(self.function, "__self__")
-            else None
-        )
-        return (
-            f"{cls.__name__}.{self.function.__name__}"
-            if cls
-            else self.function.__name__
+    def render(self, record: Record) -> str:
+        message = None
+        if self.template is not None:
+            message = self._render_template(record)
+        show_time = record.run_time is not None and not (
+            message is not None and self.template.uses_elapsed
         )
 
-    def _get_full_function_name(self) -> str:
-        func_name = self._get_function_name()
-        if self.module_name:
-            return f"{self.module_name}.{func_name}"
-        return func_name
+        if message is None:
+            formatted_vars = self.format_variables(record.args, record.kwargs)
+            variables = ", ".join(
+                f"{k}={v}" for k, v in formatted_vars.items()
+            )
+            message = f"{record.action} {self.display_name}"
+            if variables:
+                message += f" with args: {variables}"
 
-    def _log(self, message: str) -> None:
+        if show_time:
+            times = f"execution time: {self.format_time(record.run_time)}"
+            if record.measures:
+                times += "".join(
+                    f", {name} time: {self.format_time(value)}"
+                    for name, value in record.measures.items()
+                )
+            if record.items is not None:
+                times += f", items: {record.items}"
+            if record.memory is not None:
+                times += (
+                    f", allocated: {format_bytes(record.memory['allocated'])}"
+                )
+                if "peak" in record.memory:
+                    times += f", peak: {format_bytes(record.memory['peak'])}"
+            if record.outcome != OK:
+                times += f", outcome: {record.outcome}"
+            message += f" ({times})"
+        if record.depth is not None:
+            message += (
+                f" [depth: {record.depth}, parent: {record.parent or '-'}"
+                f", self time: {self.format_time(record.self_time)}]"
+            )
+        if record.memory is not None and "top" in record.memory:
+            message += "".join(f"\n  {line}" for line in record.memory["top"])
+        if record.stack is not None:
+            message += "\n" + record.stack.rstrip("\n")
+        return message
+
+    def format_time(self, seconds: float) -> str:
+        if self.units == "auto":
+            return format_duration(seconds)
+        return f"{seconds:.4f} secs"
+
+    def log(self, message: str) -> None:
         if self.logger:
-            self.logger.info(message)
+            self.logger.log(self.level, message)
         else:
             print(message)
 
-    def _log_error(self, error:Exception) -> None:
+    def log_error(self, error: Exception) -> None:
         if self.logger:
             self.logger.exception(repr(error), exc_info=True)
         else:
-            print(f"{type(error).__name__} at line {error.__traceback__.tb_lineno} of {__file__}: {error}")
+            print(
+                f"{type(error).__name__} at line {error.__traceback__.tb_lineno} of {__file__}: {error}"
+            )
 
         traceback.print_exc()
 
+    def emit(self, record: Record) -> None:
+        try:
+            if self.logger is None:
+                print(self.render(record))
+            else:
+                self.logger.log(self.level, _DeferredMessage(record))
+        except Exception as error:
+            self.log_error(error)
 
-    def _log_message(
-        self, action: str, run_time: Optional[float] = None
+    def submit(self, record: Record) -> None:
+        # isEnabledFor is cached by the logging module and the cache is
+        # cleared whenever levels or configuration change.
+        if self.logger is not None and not self.logger.isEnabledFor(
+            self.level
+        ):
+            return
+        if self.async_sink is not None:
+            self.async_sink.submit(record)
+        else:
+            self.emit(record)
+
+    def log_call(self, action: str, args: tuple, kwargs: dict) -> None:
+        # Sinks replace logging and only take finished calls.
+        if self.sinks:
+            return
+        self.submit(Record(self, action, args, kwargs))
+
+    def enter(self) -> Optional[tree.Frame]:
+        capturing = tree.capturing
+        if self.call_tree is None or capturing in (None, self.call_tree):
+            call_tree = self.call_tree or capturing
+            if call_tree is None:
+                return None
+            return call_tree.enter(self.full_name)
+        # Record the call in both trees, e.g. while imports are profiled.
+        outer = capturing.enter(self.full_name)
+        frame = self.call_tree.enter(self.full_name)
+        frame.outer = outer
+        return frame
+
+    def record(
+        self,
+        args: tuple,
+        kwargs: dict,
+        start: float,
+        run_time: float,
+        frame: Optional[tree.Frame] = None,
+        measures: Optional[Dict[str, float]] = None,
+        outcome: str = OK,
+        items: Optional[int] = None,
+        memory: Optional[Dict[str, Any]] = None,
     ) -> None:
-        formatted_vars = self._format_variables()
+        """
+        Account for a finished call. Called straight from the profiling
+        wrapper, so the caller's stack starts two frames up.
+        """
+        self_time = None
+        if frame is not None:
+            self_time = frame.tree.exit(frame, run_time)
+            if self.call_tree is None:
+                # Only captured for profile_imports(); keep records as is.
+                frame = self_time = None
+        accumulator = self.accumulator
+        if self.group_lookups is not None:
+            accumulator = self.group(args, kwargs)
+        if accumulator is not None:
+            if outcome == OK:
+                accumulator.add(run_time)
+            else:
+                accumulator.add_failure(run_time, outcome)
+            if measures:
+                accumulator.add_measures(measures)
+            if items is not None:
+                accumulator.add_measures({"items": items})
+            if memory is not None:
+                accumulator.add_memory(
+                    memory["allocated"], memory.get("peak", 0)
+                )
+        slow = False
+        if self.threshold is not None:
+            slow = self.threshold(run_time)
+            if not slow:
+                return
+        if self.sinks or accumulator is None or slow:
+            record = Record(
+                self,
+                "Finished" if outcome == OK else "Failed",
+                args,
+                kwargs,
+                start,
+                run_time,
+                frame,
+                self_time,
+                measures,
+                outcome,
+                items,
+                (
+                    _format_stack(sys._getframe(2))
+                    if self.capture_stack
+                    else None
+                ),
+                memory,
+            )
+            if not self.sinks:
+                self.submit(record)
+            for sink in self.sinks:
+                try:
+                    sink.emit(record)
+                except Exception as error:
+                    self.log_error(error)
 
-        if self.custom_message:
-            try:
-                message = self.custom_message.format(**formatted_vars)
-            except KeyError as e:
-                message = f"Error in custom message: {str(e)}. Using default format."
-                self.custom_message = None  # Fall back to default format
 
-        if not self.custom_message:
-            func_name = self._get_full_function_name()
-            variables = ", ".join(f"{k}={v}" for k, v in formatted_vars.items())
+class Profiler:
+    def __init__(
+        self,
+        function: Callable,
+        args: tuple,
+        kwargs: dict,
+        logger: Optional[Logger] = None,
+        log_start: bool = True,
+        log_variables: Optional[List[str]] = None,
+        log_all_args: bool = False,
+        custom_message: Optional[str] = None,
+        level: int = INFO,
+    ) -> None:
+        self._site = _CallSite(
+            function,
+            logger=logger,
+            log_start=log_start,
+            log_variables=log_variables,
+            log_all_args=log_all_args,
+            custom_message=custom_message,
+            level=level,
+        )
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.logger = logger
+        self.level = level
+        self.log_start = log_start
+        self.log_all_args = log_all_args
+        self.custom_message = custom_message
+        self.log_variables = self._site.log_variables
+        self.start_time = 0.0
+        self.module_name = self._site.module_name
+
+    def _extract_variables_from_custom_message(self) -> List[str]:
+        return _extract_variables(self.custom_message)
 
-            message = f"{action} {func_name}()"
-            if variables:
-                message += f" with args: {variables}"
+    def _format_variables(self) -> Dict[str, str]:
+        return self._site.format_variables(self.args, self.kwargs)
+
+    def _get_module_name(self) -> str:
+        return _get_module_name(self.function)
+
+    def _get_function_name(self) -> str:
+        return self._site.function_name
+
+    def _get_full_function_name(self) -> str:
+        return self._site.full_name
+
+    def _log(self, message: str) -> None:
+        self._site.log(message)
 
-        if run_time is not None:
-            message += f" (execution time: {run_time:.4f} secs)"
+    def _log_error(self, error: Exception) -> None:
+        self._site.log_error(error)
 
-        self._log(message)
+    def _log_message(
+        self, action: str, run_time: Optional[float] = None
+    ) -> None:
+        self._site.submit(
+            Record(
+                self._site,
+                action,
+                self.args,
+                self.kwargs,
+                self.start_time,
+                run_time,
+            )
+        )
 
     def start(self) -> None:
         try:
@@ -130,6 +727,124 @@ class Profiler:
             self._log_error(error)
 
 
+_DISABLED = object()
+
+
+class Span:
+    """
+    Times a block of code with the same engine as ``profiling()``. Use it as
+    a context manager (``with`` or ``async with``) or call ``start()`` and
+    ``stop()`` by hand when the timed region spans callbacks. A span object
+    times one region at a time; it can be reused once stopped.
+    """
+
+    def __init__(
+        self, site: _CallSite, clock: str, fields: Dict[str, Any]
+    ) -> None:
+        self._site = site
+        timer = get_clock(clock)
+        self._read, self._scale = timer.read, timer.scale
+        self._stamp = start_stamp(timer)
+        self._started_at: Optional[float] = None
+        self.fields = fields
+        self.run_time: Optional[float] = None
+        self._start_time = None
+        self._frame = None
+
+    @property
+    def name(self) -> str:
+        return self._site.full_name
+
+    def start(self) -> "Span":
+        if not switch.root.active:
+            self._start_time = _DISABLED
+            return self
+        if self._site.log_start:
+            self._site.log_call("Starting", (), self.fields)
+        self._frame = self._site.enter()
+        self.run_time = None
+        if self._stamp is not None:
+            self._started_at = self._stamp()
+        self._start_time = self._read()
+        return self
+
+    def stop(self, outcome: str = OK) -> float:
+        """Record the span and return its duration (in secs)."""
+        if self._start_time is None:
+            raise RuntimeError(f"span {self.name!r} was not started")
+        start_time, self._start_time = self._start_time, None
+        if start_time is _DISABLED:
+            self.run_time = 0.0
+            return self.run_time
+        self.run_time = (self._read() - start_time) * self._scale
+        self._site.record(
+            (),
+            self.fields,
+            (
+                start_time * self._scale
+                if self._stamp is None
+                else self._started_at
+            ),
+            self.run_time,
+            self._frame,
+            None,
+            outcome,
+        )
+        self._frame = None
+        return self.run_time
+
+    def __enter__(self) -> "Span":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop(OK if exc is None else _outcome(exc))
+
+    async def __aenter__(self) -> "Span":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.stop(OK if exc is None else _outcome(exc))
+
+
+def span(
+    name: str,
+    logger: Optional[Logger] = None,
+    log_start: bool = False,
+    level: int = INFO,
+    aggregate: Union[bool, stats.Registry] = False,
+    async_sink: Union[bool, sinks.AsyncSink] = False,
+    call_tree: Union[bool, tree.CallTree] = False,
+    sink: Union[None, sinks.Sink, List[sinks.Sink]] = None,
+    clock: str = "perf_counter",
+    units: str = "secs",
+    renderer: Optional[Callable[[Any], str]] = None,
+    **fields: Any,
+) -> Span:
+    """
+    Time a block of code instead of a whole function:
+
+        with span("parse batch", logger=logger, rows=len(rows)):
+            ...
+
+    Keyword arguments other than the options below are logged with the
+    record, like function arguments are. The options mean the same as in
+    ``profiling()``; the span's ``name`` is used where a function's qualified
+    name would be.
+    """
+    site = _CallSite(
+        None,
+        logger=logger,
+        log_start=log_start,
+        level=level,
+        aggregate=aggregate,
+        async_sink=async_sink,
+        call_tree=call_tree,
+        sink=sink,
+        units=units,
+        name=name,
+        renderer=renderer,
+    )
+    return Span(site, clock, fields)
 
 
 def profiling(
@@ -138,6 +853,28 @@ def profiling(
     log_variables: Optional[List[str]] = None,
     log_all_args: bool = False,
     custom_message: Optional[str] = None,
+    level: int = INFO,
+    aggregate: Union[bool, stats.Registry] = False,
+    async_sink: Union[bool, sinks.AsyncSink] = False,
+    sample_rate: Optional[float] = None,
+    every_n: Optional[int] = None,
+    max_per_second: Optional[float] = None,
+    call_tree: Union[bool, tree.CallTree] = False,
+    sink: Union[None, sinks.Sink, List[sinks.Sink]] = None,
+    clock: str = "perf_counter",
+    subtract_overhead: bool = False,
+    units: str = "secs",
+    measure: Iterable[str] = ("wall",),
+    renderer: Optional[Callable[[Any], str]] = None,
+    enabled: bool = True,
+    threshold_ms: Optional[float] = None,
+    threshold_percentile: Optional[float] = None,
+    capture_stack: bool = False,
+    track_memory: bool = False,
+    memory_top: int = 0,
+    memory_threshold_kb: float = 0,
+    group_by: Optional[List[str]] = None,
+    max_groups: int = 100,
 ):
     """
     We will write all the result into logger if provided, otherwise use print
@@ -148,37 +885,350 @@ def profiling(
     log_all_args: If True, log all arguments passed to the function.
     custom_message: If provided, this message will be used instead of the default logging format.
                     Variables can be included using curly braces, e.g., {variable_name}.
+                    Fields use str.format syntax ({order.id}, {total:.2f}) and
+                    may also be one of {func}, {action}, {outcome}, {thread},
+                    {elapsed}, {elapsed_ms}, {elapsed_us} or {elapsed_ns}; when
+                    an elapsed field is used the execution time is not appended.
+                    The template is checked against the function's arguments
+                    once, at decoration time, with a warning (and the default
+                    format) if it names an unknown argument.
+    level: The logging level used for messages (default: logging.INFO). When the
+           logger is not enabled for this level nothing is rendered at all, and
+           otherwise the message is only rendered once a handler emits it.
+    aggregate: If True (or a stats.Registry), record each call's duration into
+               per-function statistics instead of logging it. See
+               time_logger.stats() and time_logger.report().
+    async_sink: If True (or a sinks.AsyncSink), hand log records to a background
+                writer thread instead of writing them on the calling thread.
+    sample_rate: Profile only this fraction of calls, chosen at random.
+    every_n: Profile only every n-th call.
+    max_per_second: Profile at most this many calls per second.
+                    Calls that are not sampled run the function directly.
+    call_tree: If True (or a tree.CallTree), track which profiled function called
+               which, adding depth, parent and self time (total time minus time
+               spent in profiled callees) to each record. See
+               time_logger.write_folded() for flame graph output.
+    sink: A sinks.Sink (or list of them), such as sinks.JsonLinesSink or
+          sinks.BinarySink, that receives the raw record of each call instead
+          of the logger.
+    clock: Which clock to time with: "perf_counter" (float secs, the default),
+           or one of the integer nanosecond clocks "perf_counter_ns",
+           "monotonic_ns", "process_time_ns" (process CPU time) and
+           "thread_time_ns" (thread CPU time). Durations come from this
+           clock; start times exported to sinks are always perf_counter.
+    subtract_overhead: If True, subtract the decorator's own timing overhead,
+                       measured once per clock, from every duration.
+    units: "secs" to always print seconds with 4 decimals, or "auto" to pick
+           ns, µs, ms or s depending on the duration.
+    measure: What to measure besides wall time: "cpu" (process CPU time) and/or
+             "thread" (thread CPU time). Either adds "wait", the wall time spent
+             off-CPU. For async functions, time spent running is also reported
+             separately from time spent suspended at await.
+    renderer: Turns each logged argument into text. Defaults to a shared
+              render.ArgumentRenderer, which caps length, depth and container
+              items and summarizes arrays by shape and dtype; pass an
+              ArgumentRenderer with other limits, or repr for unbounded output.
+    enabled: Whether this function starts out profiled. The decorated function
+             gets a ``profiling_switch`` attribute to flip it at runtime; it is
+             also off while time_logger.disable() is in effect globally or for
+             its module. With the TIME_LOGGER=off environment variable set at
+             import, functions are returned unwrapped.
+
+    threshold_ms: Only record calls that take longer than this; faster calls
+                  just update counters (and aggregate statistics, if on).
+                  Slow calls are logged with all their arguments unless
+                  log_variables or custom_message says otherwise, even when
+                  aggregate is on.
+    threshold_percentile: Only record calls slower than this percentile
+                          (e.g. 99) of the function's last 1000 calls, and
+                          than threshold_ms if also given. The decorated
+                          function gets a ``threshold`` attribute with the
+                          current cutoff and the call and slow call counts.
+    capture_stack: Add the caller's stack to each record.
+    track_memory: If True, report the net bytes allocated and the peak
+                  traced memory during each call, using tracemalloc (started
+                  by the first tracked call if needed and left running until
+                  tracemalloc.stop(); it slows allocations down). With
+                  aggregate, per-function allocated_total, allocated_mean and
+                  peak_max are added to the statistics.
+    memory_top: With track_memory, list this many source lines that
+                allocated the most, for calls that allocated more than
+                memory_threshold_kb. Takes a tracemalloc snapshot per call.
+
+    group_by: With aggregate, keep statistics per combination of these
+              arguments' values (as text, like labels) instead of per
+              function, e.g. group_by=["endpoint", "tenant"] gives
+              "module.handle{endpoint=/orders,tenant=gold}". Only the first
+              max_groups combinations get their own statistics; later ones
+              share the "__overflow__" group.
+
+    Generators and async generators are timed while they run, not while the
+    consumer holds control between items: the execution time is their active
+    time, and records add the time to the first item, the consumer's time and
+    the number of items. With aggregate, per-item times are collected under
+    "<function>[item]". Generators are not part of call trees.
+
+    The function name, message template and argument positions are resolved
+    once here, so each call only reads the clock and the logged arguments.
     """
 
     def decorator(f):
-        def create_profiler(*args, **kwargs):
-            return Profiler(
-                function=f,
-                args=args,
-                kwargs=kwargs,
-                logger=logger,
-                log_start=log_start,
-                log_variables=log_variables,
-                log_all_args=log_all_args,
-                custom_message=custom_message,
-            )
+        if switch.DISABLED_AT_IMPORT:
+            return f
+        node = switch.function_switch(f.__module__, enabled)
+        threshold = None
+        if threshold_ms is not None or threshold_percentile is not None:
+            threshold = Threshold(threshold_ms, threshold_percentile)
+        site = _CallSite(
+            f,
+            logger=logger,
+            log_start=log_start,
+            log_variables=log_variables,
+            # Only slow calls are rendered, so show everything about them.
+            log_all_args=log_all_args
+            or (
+                threshold is not None
+                and log_variables is None
+                and custom_message is None
+            ),
+            custom_message=custom_message,
+            level=level,
+            aggregate=aggregate,
+            async_sink=async_sink,
+            call_tree=call_tree,
+            sink=sink,
+            units=units,
+            renderer=renderer,
+            threshold=threshold,
+            capture_stack=capture_stack,
+            group_by=group_by,
+            max_groups=max_groups,
+        )
+        sampler = make_sampler(sample_rate, every_n, max_per_second)
+        timer = get_clock(clock)
+        read, scale = timer.read, timer.scale
+        stamp = start_stamp(timer)
+        offset = overhead(timer) if subtract_overhead else 0.0
+        measures = Measures(measure)
+        if not measures.enabled:
+            measures = None
+        memory = None
+        if track_memory:
+            memory = MemoryTracker(memory_top, int(memory_threshold_kb * 1024))
 
         @wraps(f)
         def wrapper(*args, **kwargs):
-            profiler = create_profiler(*args, **kwargs)
-            profiler.start()
-            output_value = f(*args, **kwargs)
-            profiler.end()
-            return output_value
+            if not node.active:
+                return f(*args, **kwargs)
+            if sampler is not None and not sampler():
+                return f(*args, **kwargs)
+            if log_start:
+                site.log_call("Starting", args, kwargs)
+            frame = site.enter()
+            allocations = memory.start() if memory else None
+            outcome = OK
+            started_at = stamp() if stamp is not None else None
+            # The CPU clocks are read inside the wall clock's window, so
+            # CPU time never exceeds wall time by the cost of the reads.
+            start_time = read()
+            started = measures.start() if measures else None
+            try:
+                return f(*args, **kwargs)
+            except BaseException as error:
+                outcome = _outcome(error)
+                raise
+            finally:
+                measured = measures.stop(started) if measures else None
+                run_time = (read() - start_time) * scale
+                if offset:
+                    run_time = max(run_time - offset, 0.0)
+                site.record(
+                    args,
+                    kwargs,
+                    start_time * scale if started_at is None else started_at,
+                    run_time,
+                    frame,
+                    measures.results(measured, run_time) if measures else None,
+                    outcome,
+                    memory=memory.stop(allocations) if memory else None,
+                )
 
         @wraps(f)
         async def async_wrapper(*args, **kwargs):
-            profiler = create_profiler(*args, **kwargs)
-            profiler.start()
-            output_value = await f(*args, **kwargs)
-            profiler.end()
-            return output_value
+            if not node.active:
+                return await f(*args, **kwargs)
+            if sampler is not None and not sampler():
+                return await f(*args, **kwargs)
+            if log_start:
+                site.log_call("Starting", args, kwargs)
+            frame = site.enter()
+            coroutine = f(*args, **kwargs)
+            if measures:
+                coroutine = measures.wrap(coroutine)
+            allocations = memory.start() if memory else None
+            outcome = OK
+            started_at = stamp() if stamp is not None else None
+            start_time = read()
+            try:
+                return await coroutine
+            except BaseException as error:
+                outcome = _outcome(error)
+                raise
+            finally:
+                run_time = (read() - start_time) * scale
+                if offset:
+                    run_time = max(run_time - offset, 0.0)
+                site.record(
+                    args,
+                    kwargs,
+                    start_time * scale if started_at is None else started_at,
+                    run_time,
+                    frame,
+                    coroutine.results(run_time) if measures else None,
+                    outcome,
+                    memory=memory.stop(allocations) if memory else None,
+                )
+
+        @wraps(f)
+        def generator_wrapper(*args, **kwargs):
+            if not node.active or (sampler is not None and not sampler()):
+                return (yield from f(*args, **kwargs))
+            if log_start:
+                site.log_call("Starting", args, kwargs)
+            steps = GeneratorSteps(read, scale, measures, item_accumulator)
+            outcome = OK
+            started_at = stamp() if stamp is not None else None
+            start_time = read()
+            try:
+                generator = f(*args, **kwargs)
+                value, error = None, None
+                while True:
+                    started = steps.start()
+                    try:
+                        if error is None:
+                            item = generator.send(value)
+                        else:
+                            item = generator.throw(error)
+                    except StopIteration as stop:
+                        steps.stop(started, False)
+                        return stop.value
+                    except BaseException:
+                        steps.stop(started, False)
+                        raise
+                    steps.stop(started, True)
+                    try:
+                        value, error = (yield item), None
+                    except GeneratorExit:
+                        # The consumer stopped early, which is not a failure.
+                        started = steps.start()
+                        generator.close()
+                        steps.stop(started, False)
+                        raise
+                    except BaseException as exc:  # noqa: B036 - thrown in
+                        value, error = None, exc
+            except GeneratorExit:
+                raise
+            except BaseException as error:
+                outcome = _outcome(error)
+                raise
+            finally:
+                _record_steps(
+                    args, kwargs, start_time, started_at, steps, outcome
+                )
 
-        return async_wrapper if iscoroutinefunction(f) else wrapper
+        @wraps(f)
+        async def async_generator_wrapper(*args, **kwargs):
+            if not node.active or (sampler is not None and not sampler()):
+                # There is no ``yield from`` for async generators; forward
+                # items, sent values and thrown exceptions without timing.
+                generator = f(*args, **kwargs)
+                value, error = None, None
+                while True:
+                    try:
+                        if error is None:
+                            item = await generator.asend(value)
+                        else:
+                            item = await generator.athrow(error)
+                    except StopAsyncIteration:
+                        return
+                    try:
+                        value, error = (yield item), None
+                    except GeneratorExit:
+                        await generator.aclose()
+                        raise
+                    except BaseException as exc:  # noqa: B036 - thrown in
+                        value, error = None, exc
+            if log_start:
+                site.log_call("Starting", args, kwargs)
+            steps = GeneratorSteps(read, scale, measures, item_accumulator)
+            outcome = OK
+            started_at = stamp() if stamp is not None else None
+            start_time = read()
+            try:
+                generator = f(*args, **kwargs)
+                value, error = None, None
+                while True:
+                    started = steps.start()
+                    try:
+                        if error is None:
+                            item = await generator.asend(value)
+                        else:
+                            item = await generator.athrow(error)
+                    except StopAsyncIteration:
+                        steps.stop(started, False)
+                        return
+                    except BaseException:
+                        steps.stop(started, False)
+                        raise
+                    steps.stop(started, True)
+                    try:
+                        value, error = (yield item), None
+                    except GeneratorExit:
+                        started = steps.start()
+                        await generator.aclose()
+                        steps.stop(started, False)
+                        raise
+                    except BaseException as exc:  # noqa: B036 - thrown in
+                        value, error = None, exc
+            except GeneratorExit:
+                raise
+            except BaseException as error:
+                outcome = _outcome(error)
+                raise
+            finally:
+                _record_steps(
+                    args, kwargs, start_time, started_at, steps, outcome
+                )
+
+        def _record_steps(
+            args, kwargs, start_time, started_at, steps, outcome
+        ):
+            run_time = steps.active
+            if offset:
+                run_time = max(run_time - offset * (steps.items + 1), 0.0)
+            site.record(
+                args,
+                kwargs,
+                start_time * scale if started_at is None else started_at,
+                run_time,
+                None,
+                steps.results((read() - start_time) * scale),
+                outcome,
+                steps.items,
+            )
+
+        item_accumulator = site.item_accumulator
+        if isgeneratorfunction(f):
+            profiled = generator_wrapper
+        elif isasyncgenfunction(f):
+            profiled = async_generator_wrapper
+        elif iscoroutinefunction(f):
+            profiled = async_wrapper
+        else:
+            profiled = wrapper
+        profiled.profiling_switch = node
+        if threshold is not None:
+            profiled.threshold = threshold
+        return profiled
 
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,103 @@
+import reprlib
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+# Immutable types whose renders can be cached by value.
+_CACHEABLE = (str, bytes, int, float, complex, bool, type(None))
+_CONTAINERS = (list, tuple, set, frozenset, dict, deque)
+
+
+class ArgumentRenderer(reprlib.Repr):
+    """
+    Renders logged arguments with a bounded cost. Containers are cut off
+    after ``max_items`` entries (with their length appended), nesting stops
+    at ``max_depth`` and every render is capped at ``max_length`` characters.
+    Objects with a ``shape`` (NumPy arrays, DataFrames, tensors) are
+    summarized by shape and dtype instead of being rendered, and further
+    types can be summarized with ``register``.
+
+    Renders of small immutable values (numbers, and str and bytes of at
+    most ``max_length``) are cached, so an argument that comes up on every
+    call is only rendered once.
+
+    Objects of other types still have their own ``__repr__`` called before
+    it is truncated; register a summarizer for expensive ones.
+    """
+
+    def __init__(
+        self,
+        max_length: int = 500,
+        max_depth: int = 4,
+        max_items: int = 20,
+        cache_size: int = 1024,
+    ) -> None:
+        super().__init__()
+        self.max_length = max_length
+        self.max_items = max_items
+        self.maxlevel = max_depth
+        self.maxtuple = self.maxlist = self.maxarray = max_items
+        self.maxdict = self.maxset = self.maxfrozenset = max_items
+        self.maxdeque = max_items
+        self.maxstring = self.maxlong = self.maxother = max_length
+        self.summarizers: Dict[type, Callable[[Any], str]] = {}
+        self._cached_render = lru_cache(maxsize=cache_size, typed=True)(
+            self._render
+        )
+
+    def register(self, cls: type, summarizer: Callable[[Any], str]) -> None:
+        """Render instances of ``cls`` (and subclasses) with ``summarizer``."""
+        self.summarizers[cls] = summarizer
+        self._cached_render.cache_clear()
+
+    def _summarize(self, value: Any) -> Optional[str]:
+        if self.summarizers:
+            for cls in type(value).__mro__:
+                summarizer = self.summarizers.get(cls)
+                if summarizer is not None:
+                    return summarizer(value)
+        if isinstance(value, _CACHEABLE) or isinstance(value, _CONTAINERS):
+            return None
+        try:
+            shape = getattr(value, "shape", None)
+            if shape is None:
+                return None
+            shape = tuple(shape)
+            dtype = getattr(value, "dtype", None)
+        except Exception:
+            return None
+        summary = f"<{type(value).__name__} shape={shape}"
+        if dtype is not None:
+            summary += f" dtype={dtype}"
+        return summary + ">"
+
+    def repr1(self, x: Any, level: int) -> str:
+        summary = self._summarize(x)
+        if summary is not None:
+            return summary
+        return super().repr1(x, level)
+
+    def _render(self, value: Any) -> str:
+        text = self.repr(value)
+        if isinstance(value, _CONTAINERS) and len(value) > self.max_items:
+            text += f" <len={len(value)}>"
+        if len(text) > self.max_length:
+            text = text[: self.max_length - 3] + "..."
+        return text
+
+    def _cacheable(self, value: Any) -> bool:
+        # The cache keeps its keys alive, so only small values go in.
+        kind = type(value)
+        if kind is str or kind is bytes:
+            return len(value) <= self.max_length
+        if kind is int:
+            return value.bit_length() <= 4 * self.max_length
+        return kind in _CACHEABLE
+
+    def __call__(self, value: Any) -> str:
+        if self._cacheable(value):
+            return self._cached_render(value)
+        return self._render(value)
+
+
+default_renderer = ArgumentRenderer()
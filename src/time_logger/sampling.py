@@ -0,0 +1,70 @@
+import itertools
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class RateLimiter:
+    """
+    Adaptive sampler that lets through at most ``max_per_second`` calls in
+    each one-second window, so busy functions produce a steady trickle of
+    records while rarely called ones are always recorded.
+    """
+
+    def __init__(self, max_per_second: float) -> None:
+        self.max_per_second = max_per_second
+        self._window_start = time.monotonic()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._count = 0
+            if self._count < self.max_per_second:
+                self._count += 1
+                return True
+            return False
+
+
+def make_sampler(
+    sample_rate: Optional[float] = None,
+    every_n: Optional[int] = None,
+    max_per_second: Optional[float] = None,
+) -> Optional[Callable[[], bool]]:
+    """
+    Build the check run before each call to decide whether it is profiled.
+    Returns None when every call should be profiled, so the wrapper can skip
+    the check entirely. When several options are given a call must pass all.
+    """
+    checks: List[Callable[[], bool]] = []
+    if sample_rate is not None:
+        if not 0 < sample_rate <= 1:
+            raise ValueError(
+                f"sample_rate must be in (0, 1], got {sample_rate!r}"
+            )
+        if sample_rate < 1:
+            draw = random.random
+            checks.append(lambda: draw() < sample_rate)
+    if every_n is not None:
+        if every_n < 1:
+            raise ValueError(f"every_n must be at least 1, got {every_n!r}")
+        if every_n > 1:
+            # next() on itertools.count is atomic under the GIL.
+            counter = itertools.count()
+            checks.append(lambda: next(counter) % every_n == 0)
+    if max_per_second is not None:
+        if max_per_second <= 0:
+            raise ValueError(
+                f"max_per_second must be positive, got {max_per_second!r}"
+            )
+        checks.append(RateLimiter(max_per_second))
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda: all(check() for check in checks)
@@ -0,0 +1,227 @@
+import asyncio
+import threading
+from collections import deque
+from logging import INFO, Logger
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from .clock import format_duration
+from .stats import Accumulator, Histogram, Registry
+from .stats import registry as default_registry
+
+# One interval of one function: calls, total seconds, errors and the
+# non-empty histogram buckets.
+_Bucket = Dict[str, Any]
+
+
+def _label(seconds: float) -> str:
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{seconds // 60:.0f}m"
+    return f"{seconds:g}s"
+
+
+class RollingWindows:
+    """
+    Per-function statistics over the last few seconds or minutes, built
+    from the cumulative statistics of a ``Registry``. Each ``tick()``
+    stores what changed since the previous one as a bucket in a ring buffer
+    per function; a window adds up its most recent buckets. The registry
+    itself is not reset, so ``stats()`` keeps its all-time totals.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[Registry] = None,
+        interval: float = 10.0,
+        windows: Iterable[float] = (10, 60, 300),
+    ) -> None:
+        self.registry = registry or default_registry
+        self.interval = interval
+        self.windows = sorted(windows)
+        if any(window < interval for window in self.windows):
+            raise ValueError("windows must not be shorter than the interval")
+        self._sizes = {
+            window: max(round(window / interval), 1) for window in self.windows
+        }
+        self._buckets: Dict[str, Deque[_Bucket]] = {}
+        self._previous: Dict[str, Accumulator] = {}
+        self._histogram = Histogram()
+        self._lock = threading.Lock()
+
+    def tick(self) -> None:
+        """Close the current interval."""
+        size = max(self._sizes.values())
+        with self._lock:
+            for name, function_stats in self.registry.functions().items():
+                current = function_stats.merged()
+                previous = self._previous.get(name) or Accumulator()
+                bucket = self._difference(current, previous)
+                if bucket is None:
+                    # The registry was reset since the last tick.
+                    bucket = self._difference(current, Accumulator())
+                self._previous[name] = current
+                buckets = self._buckets.get(name)
+                if buckets is None:
+                    buckets = self._buckets[name] = deque(maxlen=size)
+                buckets.appendleft(bucket)
+
+    @staticmethod
+    def _difference(
+        current: Accumulator, previous: Accumulator
+    ) -> Optional[_Bucket]:
+        """What was added since ``previous``, or None if it went down."""
+        before = previous.histogram.counts
+        histogram = {
+            index: count - before[index]
+            for index, count in enumerate(current.histogram.counts)
+            if count != before[index]
+        }
+        if current.count < previous.count or any(
+            count < 0 for count in histogram.values()
+        ):
+            return None
+        return {
+            "count": current.count - previous.count,
+            "total": current.total - previous.total,
+            "errors": max(
+                sum(current.outcomes.values())
+                - sum(previous.outcomes.values()),
+                0,
+            ),
+            "histogram": histogram,
+        }
+
+    def summaries(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        ``{function: {"10s": {...}, "1m": {...}}}`` with count, errors,
+        rate (calls per second), total, mean, p50, p90 and p99 per window,
+        for functions called within the longest window.
+        """
+        histogram = self._histogram
+        results = {}
+        with self._lock:
+            for name, buckets in self._buckets.items():
+                windows = {}
+                for window in self.windows:
+                    recent = list(buckets)[: self._sizes[window]]
+                    count = sum(bucket["count"] for bucket in recent)
+                    total = sum(bucket["total"] for bucket in recent)
+                    histogram.reset()
+                    for bucket in recent:
+                        for index, n in bucket["histogram"].items():
+                            histogram.counts[index] += n
+                    histogram.total = count
+                    p50, p90, p99 = histogram.quantiles((0.5, 0.9, 0.99))
+                    windows[_label(window)] = {
+                        "count": count,
+                        "errors": sum(bucket["errors"] for bucket in recent),
+                        "rate": count / (len(recent) * self.interval),
+                        "total": total,
+                        "mean": total / count if count else 0.0,
+                        "p50": p50 or 0.0,
+                        "p90": p90 or 0.0,
+                        "p99": p99 or 0.0,
+                    }
+                largest = windows[_label(self.windows[-1])]
+                if largest["count"] or largest["errors"]:
+                    results[name] = windows
+        return results
+
+    def lines(self) -> List[str]:
+        """One line per function, covering every window."""
+        lines = []
+        for name, windows in sorted(self.summaries().items()):
+            parts = [
+                f"{label}: {summary['count']} calls "
+                f"({summary['rate']:.1f}/s), {summary['errors']} errors, "
+                f"mean {format_duration(summary['mean'])}, "
+                f"p50 {format_duration(summary['p50'])}, "
+                f"p99 {format_duration(summary['p99'])}"
+                for label, summary in windows.items()
+            ]
+            lines.append(f"{name} " + " | ".join(parts))
+        return lines
+
+
+class Reporter:
+    """
+    Ticks ``RollingWindows`` every ``interval`` seconds and emits one
+    summary line per active function: to ``logger`` (or print) or, with
+    ``callback``, as ``callback(summaries)``. Runs as an asyncio task when
+    started from a running event loop and as a daemon thread otherwise.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[Registry] = None,
+        interval: float = 10.0,
+        windows: Iterable[float] = (10, 60, 300),
+        logger: Optional[Logger] = None,
+        level: int = INFO,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.windows = RollingWindows(registry, interval, windows)
+        self.interval = interval
+        self.logger = logger
+        self.level = level
+        self.callback = callback
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def report(self) -> None:
+        """Close the current interval and emit the summaries."""
+        self.windows.tick()
+        if self.callback is not None:
+            self.callback(self.windows.summaries())
+            return
+        for line in self.windows.lines():
+            if self.logger is None:
+                print(line)
+            else:
+                self.logger.log(self.level, line)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    async def _run_async(self) -> None:
+        while not self._stopped.is_set():
+            await asyncio.sleep(self.interval)
+            self.report()
+
+    def start(self) -> "Reporter":
+        self._stopped.clear()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._thread = threading.Thread(
+                target=self._run, name="time_logger-reporter", daemon=True
+            )
+            self._thread.start()
+        else:
+            self._task = loop.create_task(self._run_async())
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def start_reporting(
+    interval: float = 10.0,
+    windows: Iterable[float] = (10, 60, 300),
+    logger: Optional[Logger] = None,
+    level: int = INFO,
+    callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Reporter:
+    """
+    Emit rolling-window summaries of every function profiled with
+    ``aggregate=True`` every ``interval`` seconds. Call ``stop()`` on the
+    returned Reporter to end it.
+    """
+    return Reporter(None, interval, windows, logger, level, callback).start()
@@ -0,0 +1,355 @@
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from typing import IO, Dict, List, Optional, Sequence, Tuple, Union
+
+OVERFLOW_POLICIES = ("drop", "block", "sample")
+
+# function id, start (ns), duration (ns), thread id
+BINARY_RECORD = struct.Struct("<IQQQ")
+BINARY_FIELDS = ("function_id", "start_ns", "duration_ns", "thread_id")
+
+
+class Sink:
+    """
+    Receives the record of every profiled call. Subclasses implement
+    ``emit``; ``flush`` and ``close`` are called when buffered output should
+    be written out.
+    """
+
+    def emit(self, record) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class AsyncSink(Sink):
+    """
+    Moves log emission off the calling thread. Records are appended to a
+    bounded queue and written by a daemon thread in batches, so slow handlers
+    no longer add to the latency of profiled functions.
+
+    target: The sink the writer thread hands records to. When omitted records
+            go to the logger (or print) of the profiled function.
+    capacity: Maximum number of queued records.
+    overflow: What to do when the queue is full. "drop" discards the new
+              record, "block" waits for the writer to make room, and "sample"
+              keeps only every ``sample_every``-th record once the queue is
+              half full (and drops when it is completely full).
+    batch_size: Maximum number of records written per batch.
+    flush_interval: How long (secs) the writer sleeps when there is no full
+                    batch waiting.
+    """
+
+    def __init__(
+        self,
+        target: Optional[Sink] = None,
+        capacity: int = 10000,
+        overflow: str = "drop",
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        sample_every: int = 10,
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}"
+            )
+        self.target = target
+        self.capacity = capacity
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_every = sample_every
+        self.dropped = 0
+        # deque.append and deque.popleft are atomic, so producers and the
+        # writer never take a lock unless the "block" policy has to wait.
+        self._queue: deque = deque()
+        self._offered = 0
+        self._wakeup = threading.Event()
+        self._not_full = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="time-logger-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, record) -> bool:
+        """Queue ``record`` for the writer. Returns False if it was dropped."""
+        if self._thread is None:
+            self._start()
+        if self._closed:
+            self._write(record)
+            return True
+
+        size = len(self._queue)
+        if size >= self.capacity:
+            if self.overflow != "block":
+                self.dropped += 1
+                return False
+            with self._not_full:
+                while len(self._queue) >= self.capacity and not self._closed:
+                    self._wakeup.set()
+                    self._not_full.wait(self.flush_interval)
+        elif self.overflow == "sample" and size >= self.capacity // 2:
+            self._offered += 1
+            if self._offered % self.sample_every:
+                self.dropped += 1
+                return False
+
+        self._queue.append(record)
+        if size + 1 >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def emit(self, record) -> None:
+        self.submit(record)
+
+    def _write(self, record) -> None:
+        if self.target is None:
+            record.site.emit(record)
+        else:
+            try:
+                self.target.emit(record)
+            except Exception as error:
+                record.site.log_error(error)
+
+    def _drain(self) -> None:
+        queue = self._queue
+        while queue:
+            self._busy = True
+            try:
+                for _ in range(min(self.batch_size, len(queue))):
+                    self._write(queue.popleft())
+            finally:
+                self._busy = False
+            if self.overflow == "block":
+                with self._not_full:
+                    self._not_full.notify_all()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until every queued record has been written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue or self._busy:
+            if self._thread is None or not self._thread.is_alive():
+                self._drain()
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            self._wakeup.set()
+            time.sleep(0.001)
+        if self.target is not None:
+            self.target.flush()
+
+    def close(self) -> None:
+        """Stop the writer thread after writing everything still queued."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._drain()
+        if self.target is not None:
+            self.target.close()
+
+
+class _FileSink(Sink):
+    def __init__(self, file: Union[str, IO], mode: str) -> None:
+        if isinstance(file, (str, os.PathLike)):
+            self.file = open(file, mode)
+            self._owns_file = True
+        else:
+            self.file = file
+            self._owns_file = False
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def _write(self, data) -> None:
+        with self._lock:
+            self.file.write(data)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self.file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._owns_file:
+                self.file.close()
+        atexit.unregister(self.close)
+
+
+class JsonLinesSink(_FileSink):
+    """Writes one JSON object per profiled call."""
+
+    def __init__(self, file: Union[str, IO]) -> None:
+        super().__init__(file, "a")
+
+    def emit(self, record) -> None:
+        if record.run_time is None:  # A "Starting" record
+            return
+        data = {
+            "function": record.name,
+            "start_ns": round(record.start * 1e9),
+            "duration_ns": round(record.run_time * 1e9),
+            "thread_id": record.thread_id,
+            "outcome": record.outcome,
+        }
+        if record.depth is not None:
+            data["depth"] = record.depth
+            data["parent"] = record.parent
+            data["self_ns"] = round(record.self_time * 1e9)
+        if record.measures:
+            for name, value in record.measures.items():
+                data[f"{name}_ns"] = round(value * 1e9)
+        if record.items is not None:
+            data["items"] = record.items
+        if record.memory is not None:
+            data.update(record.memory)
+        if record.stack is not None:
+            data["stack"] = record.stack
+        arguments = record.site.format_variables(record.args, record.kwargs)
+        if arguments:
+            data["args"] = arguments
+        self._write(json.dumps(data) + "\n")
+
+
+class BinarySink(_FileSink):
+    """
+    Writes each call as a fixed-width ``BINARY_RECORD``. Function names are
+    kept in a ``<path>.json`` sidecar, together with the offset that turns
+    the monotonic ``start_ns`` values into Unix epoch nanoseconds. Read the
+    file back with ``read_binary``. An existing file (and sidecar) is
+    overwritten, since ids and the epoch offset only hold for one session.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, "wb")
+        self.path = path
+        self.function_ids: Dict[str, int] = {}
+        self.epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._write_metadata()
+
+    def _write_metadata(self) -> None:
+        metadata = {
+            "format": BINARY_RECORD.format,
+            "fields": BINARY_FIELDS,
+            "epoch_offset_ns": self.epoch_offset_ns,
+            "functions": list(self.function_ids),
+        }
+        with open(f"{self.path}.json", "w") as file:
+            json.dump(metadata, file)
+
+    def emit(self, record) -> None:
+        if record.run_time is None:
+            return
+        function_id = self.function_ids.get(record.name)
+        if function_id is None:
+            with self._lock:
+                function_id = self.function_ids.setdefault(
+                    record.name, len(self.function_ids)
+                )
+        self._write(
+            BINARY_RECORD.pack(
+                function_id,
+                round(record.start * 1e9),
+                round(record.run_time * 1e9),
+                record.thread_id,
+            )
+        )
+
+    def flush(self) -> None:
+        super().flush()
+        self._write_metadata()
+
+
+def read_binary(
+    path: str, use_numpy: Optional[bool] = None
+) -> Tuple[List[str], Dict[str, Sequence[int]]]:
+    """
+    Load a file written by ``BinarySink``. Returns the function names (indexed
+    by ``function_id``) and one column per field in ``BINARY_FIELDS``.
+
+    The file is memory-mapped. With NumPy (used when installed, unless
+    ``use_numpy=False``) the columns are views of a structured ``np.memmap``;
+    otherwise they are ``array.array('Q')`` columns.
+    """
+    with open(f"{path}.json") as file:
+        functions = json.load(file)["functions"]
+
+    if use_numpy is not False:
+        try:
+            import numpy as np
+        except ImportError:
+            if use_numpy:
+                raise
+        else:
+            dtype = np.dtype(
+                [
+                    ("function_id", "<u4"),
+                    ("start_ns", "<u8"),
+                    ("duration_ns", "<u8"),
+                    ("thread_id", "<u8"),
+                ]
+            )
+            if os.path.getsize(path) == 0:
+                data = np.zeros(0, dtype=dtype)
+            else:
+                data = np.memmap(path, dtype=dtype, mode="r")
+            return functions, {field: data[field] for field in BINARY_FIELDS}
+
+    columns = {field: array("Q") for field in BINARY_FIELDS}
+    if os.path.getsize(path) == 0:
+        return functions, columns
+    with open(path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        for values in BINARY_RECORD.iter_unpack(mapped):
+            for column, value in zip(columns.values(), values):
+                column.append(value)
+    return functions, columns
+
+
+_default_async_sink: Optional[AsyncSink] = None
+_default_lock = threading.Lock()
+
+
+def default_async_sink() -> AsyncSink:
+    """The sink shared by every ``profiling(async_sink=True)`` function."""
+    global _default_async_sink
+    with _default_lock:
+        if _default_async_sink is None:
+            _default_async_sink = AsyncSink()
+        return _default_async_sink
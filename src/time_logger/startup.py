@@ -0,0 +1,222 @@
+"""
+Import-time profiling.
+
+    python -m time_logger.startup [--folded PATH] [--limit N] app [args...]
+
+runs ``app`` (a module name, or the path of a script) as ``__main__`` and
+then prints, for every module imported on the way and every profiled
+function that ran, its self and inclusive time, slowest first. ``--folded``
+also writes the nesting as folded stacks for flame graph tools.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+from . import tree
+from .clock import format_duration
+
+IMPORT_PREFIX = "import "
+
+
+class _TimedLoader:
+    """Wraps a module's loader to time ``exec_module``."""
+
+    def __init__(self, loader: Any, profile: "ImportProfile") -> None:
+        self._loader = loader
+        self._profile = profile
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: Any) -> Optional[ModuleType]:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        # Hand the module its real loader before any of its code runs.
+        if getattr(module, "__loader__", None) is self:
+            module.__loader__ = self._loader
+        spec = getattr(module, "__spec__", None)
+        if spec is not None and spec.loader is self:
+            spec.loader = self._loader
+        call_tree = self._profile.tree
+        frame = call_tree.enter(IMPORT_PREFIX + module.__name__)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            call_tree.exit(frame, time.perf_counter() - started)
+
+
+class _ImportFinder(MetaPathFinder):
+    """
+    First entry of ``sys.meta_path`` while profiling: asks the other
+    finders for the module's spec and wraps its loader.
+    """
+
+    def __init__(self, profile: "ImportProfile") -> None:
+        self.profile = profile
+        self._local = threading.local()
+
+    def find_spec(self, name: str, path: Any, target: Any = None) -> Any:
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self.profile)
+        return spec
+
+
+class ImportProfile:
+    """
+    Times every module imported while it is active, with nested inclusive
+    and self time, together with the profiled functions that run meanwhile
+    (whether or not they were decorated with ``call_tree``). Modules that
+    were already imported before are not imported (or timed) again.
+    Single-phase extension modules run their code in ``create_module``,
+    which is not timed.
+    """
+
+    def __init__(self) -> None:
+        self.tree = tree.CallTree()
+        self._finder = _ImportFinder(self)
+        self._previous: Optional[tree.CallTree] = None
+
+    def start(self) -> "ImportProfile":
+        sys.meta_path.insert(0, self._finder)
+        self._previous, tree.capturing = tree.capturing, self.tree
+        return self
+
+    def stop(self) -> None:
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        tree.capturing = self._previous
+
+    def __enter__(self) -> "ImportProfile":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def rows(self, sort_by: str = "total") -> List[Dict[str, Any]]:
+        """Count, self and total time per module and function, slowest first."""
+        rows: Dict[str, Dict[str, Any]] = {}
+        for path, node in self.tree.nodes().items():
+            name = path[-1]
+            row = rows.setdefault(
+                name, {"name": name, "count": 0, "self": 0.0, "total": 0.0}
+            )
+            row["count"] += node["count"]
+            row["self"] += node["self"]
+            if name not in path[:-1]:  # don't count recursion twice
+                row["total"] += node["total"]
+        return sorted(
+            rows.values(), key=lambda row: row[sort_by], reverse=True
+        )
+
+    def total(self) -> float:
+        """Time spent in top-level imports and calls."""
+        return sum(
+            node["total"]
+            for path, node in self.tree.nodes().items()
+            if len(path) == 1
+        )
+
+    def report(
+        self, limit: Optional[int] = None, sort_by: str = "total"
+    ) -> str:
+        rows = self.rows(sort_by)[:limit]
+        width = max([len("name")] + [len(row["name"]) for row in rows])
+        lines = [f"{'self':>10} {'total':>10} {'calls':>6}  name"]
+        for row in rows:
+            lines.append(
+                f"{format_duration(row['self']):>10} "
+                f"{format_duration(row['total']):>10} "
+                f"{row['count']:>6}  {row['name']:<{width}}"
+            )
+        lines.append(f"total: {format_duration(self.total())}")
+        return "\n".join(line.rstrip() for line in lines)
+
+    def folded(self) -> str:
+        return self.tree.folded()
+
+    def write_folded(self, path: str) -> None:
+        self.tree.write_folded(path)
+
+
+def profile_imports() -> ImportProfile:
+    """
+    A context manager that profiles the imports made inside it::
+
+        with time_logger.profile_imports() as imports:
+            import my_app
+        print(imports.report(limit=20))
+    """
+    return ImportProfile()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m time_logger.startup",
+        description="Time the imports and startup code of a program.",
+    )
+    parser.add_argument("--folded", metavar="PATH")
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--sort", choices=("total", "self"), default="total")
+    parser.add_argument("target", help="module name or script path")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+
+    sys.argv = [options.target] + options.args
+    status = 0
+    profile = ImportProfile().start()
+    frame = profile.tree.enter(f"run {options.target}")
+    started = time.perf_counter()
+    try:
+        if os.path.exists(options.target):
+            sys.path.insert(
+                0, os.path.dirname(os.path.abspath(options.target))
+            )
+            runpy.run_path(options.target, run_name="__main__")
+        else:
+            runpy.run_module(
+                options.target, run_name="__main__", alter_sys=True
+            )
+    except SystemExit as exit:
+        # Same as the interpreter: None is success, anything else that is
+        # not an int is printed and exits with 1.
+        if exit.code is None:
+            status = 0
+        elif isinstance(exit.code, int):
+            status = exit.code
+        else:
+            print(exit.code, file=sys.stderr)
+            status = 1
+    finally:
+        profile.tree.exit(frame, time.perf_counter() - started)
+        profile.stop()
+        print(profile.report(options.limit, options.sort), file=sys.stderr)
+        if options.folded:
+            profile.write_folded(options.folded)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
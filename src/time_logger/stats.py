@@ -0,0 +1,582 @@
+import atexit
+import json
+import math
+import os
+import threading
+import uuid
+import weakref
+from array import array
+from multiprocessing import util as multiprocessing_util
+from typing import Any, Dict, List, Optional, Sequence
+
+from .clock import format_duration
+
+# Quantiles included in every summary, by name.
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99, "p999": 0.999}
+
+
+class Histogram:
+    """
+    Mergeable log-bucketed histogram (in the style of HdrHistogram). Bucket
+    ``i`` holds durations in ``[min_value * growth**i, min_value *
+    growth**(i + 1))`` and counts are kept in a flat ``array('Q')``, so
+    memory is fixed no matter how many values are added. A quantile is
+    reported as its bucket's geometric midpoint, within ``relative_error``
+    of the true value; merging histograms with the same buckets adds their
+    counts and keeps that bound.
+    """
+
+    def __init__(
+        self,
+        min_value: float = 1e-9,
+        max_value: float = 1e4,
+        growth: float = 1.02,
+    ) -> None:
+        self.min_value = min_value
+        self.growth = growth
+        self._log_min = math.log(min_value)
+        self._log_growth = math.log(growth)
+        size = int((math.log(max_value) - self._log_min) / self._log_growth)
+        self.counts = array("Q", bytes(8 * (size + 1)))
+        self.total = 0
+
+    @property
+    def relative_error(self) -> float:
+        return math.sqrt(self.growth) - 1
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        index = int((math.log(value) - self._log_min) / self._log_growth)
+        return min(index, len(self.counts) - 1)
+
+    def add(self, value: float) -> None:
+        self.counts[self._index(value)] += 1
+        self.total += 1
+
+    def merge(self, other: "Histogram") -> None:
+        if len(other.counts) != len(self.counts) or (
+            other.min_value,
+            other.growth,
+        ) != (self.min_value, self.growth):
+            raise ValueError("cannot merge histograms with different buckets")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.total += other.total
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """The quantiles ``qs`` (in increasing order), in one pass."""
+        if not self.total:
+            return [None] * len(qs)
+        results: List[Optional[float]] = []
+        ranks = iter(qs)
+        rank = next(ranks) * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while seen >= rank:
+                # Geometric midpoint of the bucket.
+                results.append(self.min_value * self.growth ** (index + 0.5))
+                q = next(ranks, None)
+                if q is None:
+                    return results
+                rank = q * self.total
+        last = self.min_value * self.growth ** len(self.counts)
+        return results + [last] * (len(qs) - len(results))
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
+
+    def reset(self) -> None:
+        self.counts = array("Q", bytes(8 * len(self.counts)))
+        self.total = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "min_value": self.min_value,
+            "growth": self.growth,
+            "size": len(self.counts),
+            "counts": {
+                i: count for i, count in enumerate(self.counts) if count
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls(data["min_value"], growth=data["growth"])
+        histogram.counts = array("Q", bytes(8 * data["size"]))
+        for index, count in data["counts"].items():
+            histogram.counts[int(index)] = count
+            histogram.total += count
+        return histogram
+
+
+class Accumulator:
+    """
+    Count, total, min, max, mean, variance and histogram of the durations
+    recorded by one thread. Only that thread writes to it, so no lock is
+    needed; accumulators are merged when a summary is read.
+    """
+
+    def __init__(self) -> None:
+        self.histogram = Histogram()
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.measures: Dict[str, float] = {}
+        self.outcomes: Dict[str, int] = {}
+        self.memory_count = 0
+        self.allocated = 0
+        self.peak = 0
+        self.histogram.reset()
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+        # Welford's online algorithm for mean and variance.
+        delta = duration - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (duration - self.mean)
+        self.histogram.add(duration)
+
+    def merge(self, other: "Accumulator") -> None:
+        if other.count:
+            # Chan et al.'s formula for combining two partial variances.
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += (
+                other.m2 + delta * delta * self.count * other.count / count
+            )
+            self.count = count
+            self.total += other.total
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.histogram.merge(other.histogram)
+        for name, value in list(other.measures.items()):
+            self.measures[name] = self.measures.get(name, 0.0) + value
+        for outcome, count in list(other.outcomes.items()):
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        self.memory_count += other.memory_count
+        self.allocated += other.allocated
+        self.peak = max(self.peak, other.peak)
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Like ``Histogram.quantiles``, clamped to the exact min and max."""
+        return [
+            None if value is None else min(max(value, self.min), self.max)
+            for value in self.histogram.quantiles(qs)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max,
+            "mean": self.mean,
+            "m2": self.m2,
+            "measures": dict(self.measures),
+            "outcomes": dict(self.outcomes),
+            "memory": [self.memory_count, self.allocated, self.peak],
+            "histogram": self.histogram.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Accumulator":
+        accumulator = cls()
+        accumulator.count = data["count"]
+        accumulator.total = data["total"]
+        accumulator.min = math.inf if data["min"] is None else data["min"]
+        accumulator.max = data["max"]
+        accumulator.mean = data["mean"]
+        accumulator.m2 = data["m2"]
+        accumulator.measures = dict(data["measures"])
+        accumulator.outcomes = dict(data["outcomes"])
+        (
+            accumulator.memory_count,
+            accumulator.allocated,
+            accumulator.peak,
+        ) = data.get("memory", (0, 0, 0))
+        accumulator.histogram = Histogram.from_dict(data["histogram"])
+        return accumulator
+
+
+class _ThreadSlot:
+    # Held only by the thread-local, so it dies when its thread exits.
+    __slots__ = ("accumulator", "__weakref__")
+
+    def __init__(self, accumulator: Accumulator) -> None:
+        self.accumulator = accumulator
+
+
+def _retire(
+    stats: "weakref.ref[FunctionStats]", accumulator: Accumulator
+) -> None:
+    function_stats = stats()
+    if function_stats is not None:
+        function_stats._retire(accumulator)
+
+
+class FunctionStats:
+    """
+    Running count, total, min, max, mean and variance of call durations.
+    Each thread records into its own ``Accumulator``, so ``add`` takes no
+    lock; the lock is only taken the first time a thread records a call,
+    when a thread exits (its calls are folded into one ``Accumulator``
+    shared by all finished threads) and when the accumulators are merged
+    for a summary.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Optional[str] = None,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.name = name
+        self.function = function or name
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # The first entry holds the calls of threads that have exited and
+        # of merged snapshots; the others belong to running threads.
+        self._accumulators: List[Accumulator] = [Accumulator()]
+        self.failures: Optional[FunctionStats] = None
+
+    def _accumulator(self) -> Accumulator:
+        try:
+            return self._local.slot.accumulator
+        except AttributeError:
+            accumulator = Accumulator()
+            slot = self._local.slot = _ThreadSlot(accumulator)
+            finalizer = weakref.finalize(
+                slot, _retire, weakref.ref(self), accumulator
+            )
+            finalizer.atexit = False
+            with self._lock:
+                self._accumulators.append(accumulator)
+            return accumulator
+
+    def _fold(self, accumulator: Accumulator) -> None:
+        # Called with the lock held. Readers may be merging the current
+        # retired accumulator, so it is replaced rather than updated.
+        retired = Accumulator()
+        retired.merge(self._accumulators[0])
+        retired.merge(accumulator)
+        self._accumulators[0] = retired
+
+    def _retire(self, accumulator: Accumulator) -> None:
+        with self._lock:
+            self._fold(accumulator)
+            self._accumulators.remove(accumulator)
+
+    def reset(self) -> None:
+        with self._lock:
+            for accumulator in self._accumulators:
+                accumulator.reset()
+        if self.failures is not None:
+            self.failures.reset()
+
+    def add(self, duration: float) -> None:
+        self._accumulator().add(duration)
+
+    def add_failure(self, duration: float, outcome: str) -> None:
+        """
+        Record a call that raised (or was cancelled). Failed calls are kept
+        in their own ``failures`` stats so they do not skew the latency of
+        successful calls.
+        """
+        self._failures().add(duration)
+        outcomes = self._accumulator().outcomes
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def _failures(self) -> "FunctionStats":
+        if self.failures is None:
+            with self._lock:
+                if self.failures is None:
+                    self.failures = FunctionStats(
+                        self.name, self.function, self.labels
+                    )
+        return self.failures
+
+    def add_memory(self, allocated: int, peak: int) -> None:
+        """Add the net and peak bytes allocated by one call."""
+        accumulator = self._accumulator()
+        accumulator.memory_count += 1
+        accumulator.allocated += allocated
+        if peak > accumulator.peak:
+            accumulator.peak = peak
+
+    def add_measures(self, measures: Dict[str, float]) -> None:
+        """Add CPU, wait and similar per-call times to their running totals."""
+        totals = self._accumulator().measures
+        for name, value in measures.items():
+            totals[name] = totals.get(name, 0.0) + value
+
+    def merge(
+        self,
+        accumulator: Accumulator,
+        failures: Optional[Accumulator] = None,
+    ) -> None:
+        """Add the calls recorded elsewhere, e.g. in another process."""
+        with self._lock:
+            self._fold(accumulator)
+        if failures is not None:
+            self._failures().merge(failures)
+
+    def merged(self) -> Accumulator:
+        """The calls of all threads, combined into one accumulator."""
+        with self._lock:
+            accumulators = list(self._accumulators)
+        total = Accumulator()
+        for accumulator in accumulators:
+            total.merge(accumulator)
+        return total
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return sum(accumulator.count for accumulator in self._accumulators)
+
+    @property
+    def outcomes(self) -> Dict[str, int]:
+        return self.merged().outcomes
+
+    @property
+    def variance(self) -> float:
+        merged = self.merged()
+        return merged.m2 / (merged.count - 1) if merged.count > 1 else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.merged().quantiles((q,))[0]
+
+    def summary(self) -> Dict[str, Any]:
+        merged = self.merged()
+        count = merged.count
+        summary = {
+            "count": count,
+            "total": merged.total,
+            "min": merged.min if count else 0.0,
+            "max": merged.max,
+            "mean": merged.mean,
+            "variance": merged.m2 / (count - 1) if count > 1 else 0.0,
+        }
+        for name, value in zip(
+            QUANTILES, merged.quantiles(tuple(QUANTILES.values()))
+        ):
+            summary[name] = value or 0.0
+        for name, value in merged.measures.items():
+            summary[f"{name}_total"] = value
+        if merged.memory_count:
+            summary["allocated_total"] = merged.allocated
+            summary["allocated_mean"] = merged.allocated / merged.memory_count
+            summary["peak_max"] = merged.peak
+        summary["errors"] = sum(merged.outcomes.values())
+        if merged.outcomes:
+            summary["outcomes"] = merged.outcomes
+            summary["failures"] = self.failures.summary()
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "function": self.function,
+            "labels": self.labels,
+            "calls": self.merged().to_dict(),
+            "failures": (
+                None
+                if self.failures is None
+                else self.failures.merged().to_dict()
+            ),
+        }
+
+
+class Registry:
+    """Per-function accumulators for ``profiling(aggregate=...)``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._functions: Dict[str, FunctionStats] = {}
+        self._spool_directory: Optional[str] = None
+        _registries.add(self)
+
+    def get(
+        self, name: str, labels: Optional[Dict[str, str]] = None
+    ) -> FunctionStats:
+        """
+        The statistics of function ``name`` or, with ``labels``, of its
+        calls with those labels, kept as ``name{label=value,...}``.
+        """
+        key = name
+        if labels:
+            key += (
+                "{"
+                + ",".join(
+                    f"{label}={value}" for label, value in labels.items()
+                )
+                + "}"
+            )
+        function_stats = self._functions.get(key)
+        if function_stats is None:
+            with self._lock:
+                function_stats = self._functions.get(key)
+                if function_stats is None:
+                    function_stats = self._functions[key] = FunctionStats(
+                        key, name, labels
+                    )
+        return function_stats
+
+    def functions(self) -> Dict[str, FunctionStats]:
+        return dict(self._functions)
+
+    def record(self, name: str, duration: float) -> None:
+        self.get(name).add(duration)
+
+    def reset(self) -> None:
+        for function_stats in list(self._functions.values()):
+            function_stats.reset()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        summaries = {}
+        for name, function_stats in list(self._functions.items()):
+            summary = function_stats.summary()
+            if summary["count"] or summary["errors"]:
+                summaries[name] = summary
+        return summaries
+
+    def report(self, sort_by: str = "total") -> str:
+        rows = sorted(
+            self.stats().items(),
+            key=lambda item: item[1][sort_by],
+            reverse=True,
+        )
+        columns = ["total", "mean", "min", "max", "p50", "p90", "p99", "p999"]
+        width = max([len("function")] + [len(name) for name, _ in rows])
+        lines: List[str] = [
+            f"{'function':<{width}} {'calls':>8} {'errors':>8} "
+            + " ".join(f"{column:>10}" for column in columns)
+        ]
+        for name, summary in rows:
+            lines.append(
+                f"{name:<{width}} {summary['count']:>8} "
+                f"{summary['errors']:>8} "
+                + " ".join(
+                    f"{format_duration(summary[column]):>10}"
+                    for column in columns
+                )
+            )
+        return "\n".join(lines)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far, as JSON-serializable data."""
+        return {
+            name: function_stats.to_dict()
+            for name, function_stats in list(self._functions.items())
+        }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Add the calls of a ``snapshot()`` taken in another process."""
+        for name, data in snapshot.items():
+            failures = data["failures"]
+            self.get(data.get("function", name), data.get("labels")).merge(
+                Accumulator.from_dict(data["calls"]),
+                None if failures is None else Accumulator.from_dict(failures),
+            )
+
+    def dump(self, directory: str) -> str:
+        """
+        Write ``snapshot()`` to a new file in ``directory`` and return its
+        path. The file is renamed into place once complete, so ``collect``
+        never reads a partial file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{os.getpid()}-{uuid.uuid4().hex}.json"
+        )
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def spool_at_exit(self, directory: str) -> None:
+        """
+        ``dump(directory)`` when this process exits, including
+        ``multiprocessing`` and ``ProcessPoolExecutor`` workers, which skip
+        ``atexit`` handlers.
+        """
+        if self._spool_directory is None:
+            atexit.register(self._spool)
+            multiprocessing_util.Finalize(None, self._spool, exitpriority=10)
+        self._spool_directory = directory
+
+    def _spool(self) -> None:
+        directory, self._spool_directory = self._spool_directory, None
+        if directory is not None and self.stats():
+            self.dump(directory)
+
+    def collect(self, directory: str, remove: bool = True) -> None:
+        """Merge the files written by ``dump`` into this registry."""
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(directory, name)
+            with open(path) as file:
+                self.merge(json.load(file))
+            if remove:
+                os.remove(path)
+
+
+_registries: "weakref.WeakSet[Registry]" = weakref.WeakSet()
+
+
+def _reset_after_fork() -> None:
+    # A forked worker starts with a copy of the parent's numbers. Clear them
+    # in the child so that collected spools don't count them twice.
+    for registry in list(_registries):
+        registry.reset()
+        registry._spool_directory = None
+
+
+if hasattr(os, "register_at_fork"):  # Not on Windows
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+registry = Registry()
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Summaries of every function profiled with ``aggregate=True``."""
+    return registry.stats()
+
+
+def report(sort_by: str = "total") -> str:
+    """A table of ``stats()``, sorted by ``sort_by`` (largest first)."""
+    return registry.report(sort_by)
+
+
+def spool_at_exit(directory: str) -> None:
+    """
+    Have this process add its ``aggregate=True`` statistics to
+    ``directory`` when it exits. Call it in each worker, e.g. as the
+    ``initializer`` of a ``ProcessPoolExecutor`` or in gunicorn's
+    ``post_fork`` hook, then ``collect(directory)`` in the parent.
+    """
+    registry.spool_at_exit(directory)
+
+
+def collect(directory: str, remove: bool = True) -> None:
+    """Merge the statistics spooled by worker processes into ``stats()``."""
+    registry.collect(directory, remove)
@@ -0,0 +1,112 @@
+import os
+import threading
+import weakref
+from typing import Dict, Optional
+
+_OFF_VALUES = ("off", "0", "false", "no", "disabled")
+
+
+def _enabled_by_environment() -> bool:
+    value = os.environ.get("TIME_LOGGER", "on")
+    return value.strip().lower() not in _OFF_VALUES
+
+
+# With TIME_LOGGER=off at import time profiling() returns functions
+# unwrapped, so they cost nothing at all (and cannot be enabled later).
+DISABLED_AT_IMPORT = not _enabled_by_environment()
+
+
+class Switch:
+    """
+    An on/off switch in a tree: the global switch, one per module (and
+    package) and one per profiled function. ``active`` is kept up to date as
+    "this switch and all its parents are enabled", so a profiled call only
+    has to read one attribute to know whether to time itself.
+    """
+
+    __slots__ = (
+        "name",
+        "parent",
+        "enabled",
+        "active",
+        "_children",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Switch"] = None,
+        enabled: bool = True,
+    ) -> None:
+        self.name = name
+        self.parent = parent
+        self.enabled = enabled
+        self._children: "weakref.WeakSet[Switch]" = weakref.WeakSet()
+        if parent is not None:
+            parent._children.add(self)
+        self.active = enabled and (parent is None or parent.active)
+
+    def _update(self) -> None:
+        self.active = self.enabled and (
+            self.parent is None or self.parent.active
+        )
+        for child in list(self._children):
+            child._update()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._update()
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._update()
+
+    def __repr__(self) -> str:
+        state = "on" if self.active else "off"
+        return f"<Switch {self.name or '(global)'} {state}>"
+
+
+root = Switch("", enabled=not DISABLED_AT_IMPORT)
+_modules: Dict[str, Switch] = {}
+_lock = threading.Lock()
+
+
+def module_switch(module: str) -> Switch:
+    """The switch for ``module``, nested under the switches of its packages."""
+    node = _modules.get(module)
+    if node is not None:
+        return node
+    with _lock:
+        parent = root
+        path = []
+        for part in module.split("."):
+            path.append(part)
+            name = ".".join(path)
+            node = _modules.get(name)
+            if node is None:
+                node = _modules[name] = Switch(name, parent)
+            parent = node
+        return node
+
+
+def function_switch(module: Optional[str], enabled: bool = True) -> Switch:
+    parent = module_switch(module) if module else root
+    return Switch(module or "", parent, enabled)
+
+
+def enable(module: Optional[str] = None) -> None:
+    """Turn profiling back on, globally or for ``module`` and its submodules."""
+    (root if module is None else module_switch(module)).enable()
+
+
+def disable(module: Optional[str] = None) -> None:
+    """
+    Turn profiling off, globally or for ``module`` and its submodules.
+    Profiled functions then call straight through until ``enable()``.
+    """
+    (root if module is None else module_switch(module)).disable()
+
+
+def is_enabled(module: Optional[str] = None) -> bool:
+    return (root if module is None else module_switch(module)).active
@@ -0,0 +1,131 @@
+import re
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Fields that are always available to custom messages, besides arguments.
+BUILTIN_FIELDS = (
+    "func",
+    "action",
+    "outcome",
+    "thread",
+    "elapsed",
+    "elapsed_ms",
+    "elapsed_us",
+    "elapsed_ns",
+)
+ELAPSED_FIELDS = ("elapsed", "elapsed_ms", "elapsed_us", "elapsed_ns")
+
+_FIELD = re.compile(r"(\w+)((?:\.\w+|\[[^\]]+\])*)$")
+_ACCESSOR = re.compile(r"\.(\w+)|\[([^\]]+)\]")
+_CONVERSIONS: Dict[str, Callable[[Any], str]] = {
+    "r": repr,
+    "s": str,
+    "a": ascii,
+}
+
+Field = Tuple[str, List[Tuple[bool, Any]], str, Optional[str]]
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class MessageTemplate:
+    """
+    A ``custom_message`` parsed once into literal text and fields. Fields
+    follow ``str.format`` syntax: ``{order.id}``, ``{items[0]}``,
+    ``{elapsed_ms:.2f}`` and ``{name!s}`` all work. Argument fields without a
+    format spec or conversion are rendered like logged arguments (``repr``
+    style), as they always have been.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self.parts: List[Tuple[str, Optional[Field]]] = []
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as error:
+            raise TemplateError(f"{template!r}: {error}") from None
+        for literal, field_name, spec, conversion in parsed:
+            if field_name is None:
+                self.parts.append((literal, None))
+                continue
+            match = _FIELD.match(field_name)
+            if match is None or match.group(1).isdigit():
+                raise TemplateError(
+                    f"{template!r}: field {{{field_name}}} must name an "
+                    "argument or one of " + ", ".join(BUILTIN_FIELDS)
+                )
+            if "{" in spec:
+                raise TemplateError(
+                    f"{template!r}: nested fields in format specs are not "
+                    "supported"
+                )
+            accessors = [
+                (bool(attribute), attribute or _index(key))
+                for attribute, key in _ACCESSOR.findall(match.group(2))
+            ]
+            self.parts.append(
+                (literal, (match.group(1), accessors, spec, conversion))
+            )
+
+        self.fields = [field[0] for _, field in self.parts if field]
+        self.variables = list(
+            dict.fromkeys(
+                name for name in self.fields if name not in BUILTIN_FIELDS
+            )
+        )
+        self.uses_elapsed = any(name in ELAPSED_FIELDS for name in self.fields)
+
+    def validate(
+        self, parameters: Iterable[str], accepts_any_keyword: bool = False
+    ) -> None:
+        """Raise TemplateError if a field names no argument of the function."""
+        if accepts_any_keyword:
+            return
+        parameters = set(parameters)
+        unknown = [name for name in self.variables if name not in parameters]
+        if unknown:
+            raise TemplateError(
+                f"{self.template!r} refers to unknown argument(s): "
+                + ", ".join(unknown)
+            )
+
+    def render(
+        self,
+        values: Dict[str, Any],
+        builtins: Dict[str, Any],
+        renderer: Callable[[Any], str],
+    ) -> str:
+        """
+        Fill the template. Raises LookupError, AttributeError, TypeError or
+        ValueError when a value is missing or cannot be formatted.
+        """
+        pieces = []
+        for literal, field in self.parts:
+            pieces.append(literal)
+            if field is None:
+                continue
+            name, accessors, spec, conversion = field
+            if name in values:
+                value = values[name]
+            else:
+                value = builtins[name]
+                if value is None and name in ELAPSED_FIELDS:
+                    pieces.append("-")
+                    continue
+            for is_attribute, key in accessors:
+                value = getattr(value, key) if is_attribute else value[key]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            if spec or conversion:
+                pieces.append(format(value, spec))
+            elif name in values:
+                pieces.append(renderer(value))
+            else:
+                pieces.append(str(value))
+        return "".join(pieces)
+
+
+def _index(key: str) -> Any:
+    return int(key) if key.isdigit() else key
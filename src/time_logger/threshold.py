@@ -0,0 +1,74 @@
+import math
+import threading
+from array import array
+from typing import Optional
+
+
+class Threshold:
+    """
+    Decides which calls are slow enough to be recorded. A call is slow when
+    it takes longer than ``threshold_ms`` and, with ``percentile``, longer
+    than that percentile of the function's last ``window`` calls. Until
+    ``min_samples`` calls have been seen only the fixed threshold applies.
+
+    Every call updates the ``calls`` and ``slow`` counters; the percentile
+    cutoff is recomputed every ``window // 10`` calls rather than per call.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: Optional[float] = None,
+        percentile: Optional[float] = None,
+        window: int = 1000,
+        min_samples: int = 100,
+    ) -> None:
+        if threshold_ms is None and percentile is None:
+            raise ValueError("give threshold_ms, percentile or both")
+        if percentile is not None and not 0 < percentile < 100:
+            raise ValueError(
+                f"percentile must be in (0, 100), got {percentile!r}"
+            )
+        self.minimum = 0.0 if threshold_ms is None else threshold_ms / 1e3
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min(min_samples, window)
+        self.calls = 0
+        self.slow = 0
+        self.cutoff = math.inf if percentile is not None else self.minimum
+        self._history = array("d", bytes(8 * window))
+        self._refresh_every = max(window // 10, 1)
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        samples = sorted(self._history[: min(self.calls, self.window)])
+        rank = math.ceil(self.percentile / 100 * len(samples)) - 1
+        self.cutoff = max(samples[max(rank, 0)], self.minimum)
+
+    def __call__(self, run_time: float) -> bool:
+        """Count a call of ``run_time`` seconds and tell whether it is slow."""
+        if self.percentile is None:
+            self.calls += 1
+            slow = run_time > self.cutoff
+        else:
+            with self._lock:
+                self._history[self.calls % self.window] = run_time
+                self.calls += 1
+                if self.calls == self.min_samples or (
+                    self.calls > self.min_samples
+                    and self.calls % self._refresh_every == 0
+                ):
+                    self._refresh()
+                if self.calls < self.min_samples:
+                    # Not enough history yet: only the fixed threshold.
+                    slow = 0.0 < self.minimum < run_time
+                else:
+                    slow = run_time > self.cutoff
+        if slow:
+            self.slow += 1
+        return slow
+
+    def __repr__(self) -> str:
+        return (
+            f"<Threshold cutoff={self.cutoff:.6f}s calls={self.calls} "
+            f"slow={self.slow}>"
+        )
@@ -0,0 +1,135 @@
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+_current_frame: ContextVar[Optional["Frame"]] = ContextVar(
+    "time_logger_frame", default=None
+)
+
+
+class Frame:
+    """
+    A profiled call that is currently running, linked to its caller in the
+    same tree (``parent``) and to the frame below it on the context's stack
+    (``previous``), which may belong to another tree. ``outer`` is the
+    frame of the same call in the capturing tree, if any.
+    """
+
+    __slots__ = (
+        "name",
+        "parent",
+        "previous",
+        "outer",
+        "depth",
+        "path",
+        "child_time",
+        "token",
+        "tree",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: Optional["Frame"],
+        tree: Optional["CallTree"] = None,
+        previous: Optional["Frame"] = None,
+    ) -> None:
+        self.name = name
+        self.parent = parent
+        self.previous = previous
+        self.outer: Optional[Frame] = None
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.path = (name,) if parent is None else parent.path + (name,)
+        self.child_time = 0.0
+        self.token = None
+        self.tree = tree
+
+
+class CallTree:
+    """
+    Aggregates profiled calls by their call path. The stack of running calls
+    lives in a context variable, so it follows each thread and each asyncio
+    task (including across ``await``).
+
+    For concurrently awaited children the summed child time can exceed the
+    parent's own duration; self time is clamped at zero in that case.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._nodes: Dict[Tuple[str, ...], List[float]] = {}
+
+    def enter(self, name: str) -> Frame:
+        previous = parent = _current_frame.get()
+        # Only calls of this tree are its parents; other trees' frames on
+        # the stack (e.g. an import being profiled) are skipped.
+        while parent is not None and parent.tree is not self:
+            parent = parent.previous
+        frame = Frame(name, parent, self, previous)
+        frame.token = _current_frame.set(frame)
+        return frame
+
+    def exit(self, frame: Frame, run_time: float) -> float:
+        """Pop ``frame`` and return its self (exclusive) time."""
+        try:
+            _current_frame.reset(frame.token)
+        except ValueError:
+            # Manually stopped spans may end in a different context than
+            # the one they started in; that context has its own stack.
+            pass
+        self_time = max(run_time - frame.child_time, 0.0)
+        if frame.parent is not None:
+            frame.parent.child_time += run_time
+        with self._lock:
+            node = self._nodes.get(frame.path)
+            if node is None:
+                node = self._nodes[frame.path] = [0, 0.0, 0.0]
+            node[0] += 1
+            node[1] += run_time
+            node[2] += self_time
+        if frame.outer is not None:
+            frame.outer.tree.exit(frame.outer, run_time)
+        return self_time
+
+    def nodes(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        with self._lock:
+            return {
+                path: {"count": count, "total": total, "self": self_time}
+                for path, (count, total, self_time) in self._nodes.items()
+            }
+
+    def folded(self) -> str:
+        """
+        The tree in the folded-stack format read by flamegraph.pl and
+        speedscope: one ``caller;callee <self time in µs>`` line per path.
+        """
+        return "\n".join(
+            f"{';'.join(path)} {round(node['self'] * 1e6)}"
+            for path, node in sorted(self.nodes().items())
+        )
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w") as file:
+            file.write(self.folded())
+            file.write("\n")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+
+
+call_tree = CallTree()
+
+# While set (by startup.profile_imports), profiled calls that have no call
+# tree of their own are added to this one.
+capturing: Optional[CallTree] = None
+
+
+def folded_stacks() -> str:
+    """Folded stacks of every function profiled with ``call_tree=True``."""
+    return call_tree.folded()
+
+
+def write_folded(path: str) -> None:
+    """Write ``folded_stacks()`` to ``path`` for flame graph tools."""
+    call_tree.write_folded(path)
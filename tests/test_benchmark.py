@@ -0,0 +1,33 @@
+from benchmarks.overhead import compare, format_table, run
+
+
+def test_benchmark_runs_every_configuration():
+    results = run(number=20, repeat=1)
+
+    for name in [
+        "undecorated",
+        "default",
+        "log_start",
+        "log_variables",
+        "log_all_args",
+        "custom_message",
+        "disabled_level",
+        "async",
+    ]:
+        assert results[name]["ns_per_call"] > 0
+    assert "disabled_level" in format_table(results)
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {
+        "default": {"ns_per_call": 1100.0, "overhead_ns": 1000.0},
+        "disabled": {"ns_per_call": 110.0, "overhead_ns": 10.0},
+    }
+    results = {
+        "default": {"ns_per_call": 1400.0, "overhead_ns": 1300.0},
+        "disabled": {"ns_per_call": 120.0, "overhead_ns": 20.0},
+        "new": {"ns_per_call": 5000.0, "overhead_ns": 4900.0},
+    }
+
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("default:")
@@ -0,0 +1,69 @@
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger import clock
+from src.time_logger.clock import calibrate, format_duration, get_clock
+from src.time_logger.profile import profiling
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@pytest.mark.parametrize("seconds,expected", [
+    (42e-9, "42 ns"),
+    (12.5e-6, "12.50 µs"),
+    (0.00456, "4.56 ms"),
+    (1.5, "1.5000 s"),
+])
+def test_format_duration(seconds, expected):
+    assert format_duration(seconds) == expected
+
+def test_get_clock_rejects_unknown_clock():
+    with pytest.raises(ValueError):
+        get_clock("sundial")
+
+@pytest.mark.parametrize("name", clock.CLOCKS)
+def test_calibrate_every_clock(name):
+    assert calibrate(get_clock(name), rounds=10) >= 0
+
+@patch('time.perf_counter_ns')
+def test_profiling_with_ns_clock_and_auto_units(mock_perf_counter_ns, logger):
+    logger, log_capture = logger
+    mock_perf_counter_ns.side_effect = [1_000, 13_500]
+
+    @profiling(logger, clock="perf_counter_ns", units="auto")
+    def test_func():
+        pass
+
+    test_func()
+    assert "Finished tests.test_clock.test_func() (execution time: 12.50 µs)" in log_capture.getvalue()
+
+@patch('time.perf_counter_ns')
+def test_profiling_subtracts_calibrated_overhead(mock_perf_counter_ns, logger):
+    logger, log_capture = logger
+    mock_perf_counter_ns.side_effect = [0, 1_000, 2_000, 2_200]
+
+    with patch.dict(clock._overheads, {"perf_counter_ns": 400e-9}):
+        @profiling(logger, clock="perf_counter_ns", units="auto", subtract_overhead=True)
+        def test_func():
+            pass
+
+        test_func()
+        test_func()
+
+    log_output = log_capture.getvalue()
+    assert "(execution time: 600 ns)" in log_output
+    # Durations never go negative after subtracting the overhead.
+    assert "(execution time: 0 ns)" in log_output
+
+def test_profiling_rejects_unknown_units():
+    with pytest.raises(ValueError):
+        profiling(units="fortnights")(lambda: None)
@@ -0,0 +1,68 @@
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from src.time_logger.exposition import exposition, start_http_server
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+
+def make_registry():
+    registry = Registry()
+    for duration in [0.0002, 0.003, 0.003, 0.2]:
+        registry.record("app.handle", duration)
+    registry.get("app.handle").add_failure(0.5, "TimeoutError")
+    return registry
+
+def test_exposition_renders_counters_and_histogram():
+    text = exposition(make_registry())
+
+    assert "# TYPE time_logger_calls_total counter" in text
+    assert 'time_logger_calls_total{function="app.handle"} 5' in text
+    assert (
+        'time_logger_errors_total{function="app.handle",outcome="TimeoutError"} 1'
+        in text
+    )
+    assert "# TYPE time_logger_call_duration_seconds histogram" in text
+    assert 'time_logger_call_duration_seconds_bucket{function="app.handle",le="0.0001"} 0' in text
+    assert 'time_logger_call_duration_seconds_bucket{function="app.handle",le="0.00025"} 1' in text
+    assert 'time_logger_call_duration_seconds_bucket{function="app.handle",le="0.005"} 3' in text
+    assert 'time_logger_call_duration_seconds_bucket{function="app.handle",le="+Inf"} 4' in text
+    assert 'time_logger_call_duration_seconds_count{function="app.handle"} 4' in text
+    assert 'time_logger_call_duration_seconds_sum{function="app.handle"} 0.2062' in text
+
+def test_exposition_escapes_label_values():
+    registry = Registry()
+    registry.record('odd"name\\', 0.1)
+
+    assert 'function="odd\\"name\\\\"' in exposition(registry)
+
+def test_exposition_of_profiled_function():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def test_func():
+        pass
+
+    test_func()
+    assert (
+        'time_logger_calls_total{function="tests.test_exposition.test_func"} 1'
+        in exposition(registry, prefix="time_logger")
+    )
+
+def test_http_server_serves_metrics():
+    server = start_http_server(0, "127.0.0.1", registry=make_registry())
+    try:
+        host, port = server.server_address
+        with urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            body = response.read().decode()
+        assert 'time_logger_calls_total{function="app.handle"} 5' in body
+
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"http://{host}:{port}/other")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@patch('time.perf_counter')
+def test_generator_active_time_excludes_consumer(mock_perf_counter, logger):
+    logger, log_capture = logger
+    # start, first step (2s, one item), consumer holds 7s, last step, end.
+    mock_perf_counter.side_effect = [0, 1, 3, 10, 11, 11]
+
+    @profiling(logger)
+    def numbers():
+        yield 1
+
+    assert list(numbers()) == [1]
+    assert (
+        "Finished tests.test_generators.numbers() (execution time: 3.0000 secs, "
+        "first_item time: 2.0000 secs, consumer time: 8.0000 secs, items: 1)"
+    ) in log_capture.getvalue()
+
+def test_generator_keeps_send_and_return_value():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def echo():
+        received = yield "ready"
+        yield received * 2
+        return "done"
+
+    generator = echo()
+    assert next(generator) == "ready"
+    assert generator.send(21) == 42
+    with pytest.raises(StopIteration) as stop:
+        next(generator)
+    assert stop.value.value == "done"
+
+    summary = registry.stats()["tests.test_generators.echo"]
+    assert summary["count"] == 1
+    assert summary["items_total"] == 2
+    assert registry.stats()["tests.test_generators.echo[item]"]["count"] == 2
+
+def test_generator_closed_early_is_not_a_failure():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def forever():
+        while True:
+            yield 1
+
+    for i, _ in zip(range(3), forever()):
+        pass
+
+    summary = registry.stats()["tests.test_generators.forever"]
+    assert summary["count"] == 1
+    assert summary["errors"] == 0
+    assert summary["items_total"] == 3
+
+def test_generator_failure_is_tagged():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def broken():
+        yield 1
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        list(broken())
+
+    summary = registry.stats()["tests.test_generators.broken"]
+    assert summary["outcomes"] == {"KeyError": 1}
+
+def test_generator_throw_reaches_wrapped_generator():
+    @profiling(aggregate=Registry())
+    def resilient():
+        while True:
+            try:
+                yield "ok"
+            except ValueError:
+                yield "recovered"
+
+    generator = resilient()
+    next(generator)
+    assert generator.throw(ValueError) == "recovered"
+    generator.close()
+
+@pytest.mark.asyncio
+async def test_async_generator_counts_items_and_first_item():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    async def ticks(n):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    assert [i async for i in ticks(5)] == [0, 1, 2, 3, 4]
+
+    summary = registry.stats()["tests.test_generators.ticks"]
+    assert summary["count"] == 1
+    assert summary["items_total"] == 5
+    assert summary["first_item_total"] <= summary["total"]
+    assert registry.stats()["tests.test_generators.ticks[item]"]["count"] == 5
+
+@pytest.mark.asyncio
+async def test_async_generator_closed_early(logger):
+    logger, log_capture = logger
+
+    @profiling(logger)
+    async def forever():
+        while True:
+            yield 1
+
+    generator = forever()
+    assert await generator.__anext__() == 1
+    await generator.aclose()
+
+    assert "Finished tests.test_generators.forever()" in log_capture.getvalue()
+    assert "items: 1)" in log_capture.getvalue()
+
+def test_disabled_generator_passes_through():
+    @profiling(aggregate=Registry(), enabled=False)
+    def numbers():
+        yield from range(3)
+
+    assert list(numbers()) == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_disabled_async_generator_is_not_timed():
+    @profiling(aggregate=Registry(), enabled=False)
+    async def echo():
+        received = yield "ready"
+        while True:
+            try:
+                received = yield received
+            except KeyError:
+                received = "caught"
+
+    with patch("src.time_logger.profile.GeneratorSteps") as steps:
+        generator = echo()
+        assert await generator.asend(None) == "ready"
+        assert await generator.asend(1) == 1
+        assert await generator.athrow(KeyError()) == "caught"
+        await generator.aclose()
+
+    steps.assert_not_called()
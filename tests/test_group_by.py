@@ -0,0 +1,119 @@
+import pytest
+
+from src.time_logger.exposition import exposition
+from src.time_logger.profile import OVERFLOW, profiling
+from src.time_logger.stats import Registry
+
+def test_stats_are_kept_per_label_combination():
+    registry = Registry()
+
+    @profiling(aggregate=registry, group_by=["endpoint", "tier"])
+    def handle(endpoint, payload, tier="free"):
+        pass
+
+    handle("/orders", {}, tier="gold")
+    handle("/orders", {}, tier="gold")
+    handle("/orders", {})
+    handle(endpoint="/users", payload={})
+
+    stats = registry.stats()
+    name = "tests.test_group_by.handle"
+    assert stats[f"{name}{{endpoint=/orders,tier=gold}}"]["count"] == 2
+    assert stats[f"{name}{{endpoint=/orders,tier=free}}"]["count"] == 1
+    assert stats[f"{name}{{endpoint=/users,tier=free}}"]["count"] == 1
+    assert name not in stats
+
+def test_groups_beyond_cap_share_overflow_bucket():
+    registry = Registry()
+
+    @profiling(aggregate=registry, group_by=["customer"], max_groups=2)
+    def handle(customer):
+        pass
+
+    for customer in ["a", "b", "c", "d", "a"]:
+        handle(customer)
+
+    stats = registry.stats()
+    name = "tests.test_group_by.handle"
+    assert stats[f"{name}{{customer=a}}"]["count"] == 2
+    assert stats[f"{name}{{customer=b}}"]["count"] == 1
+    assert stats[f"{name}{{customer={OVERFLOW}}}"]["count"] == 2
+    assert len(stats) == 3
+
+def test_grouped_failures_are_tagged():
+    registry = Registry()
+
+    @profiling(aggregate=registry, group_by=["kind"])
+    def handle(kind):
+        if kind == "bad":
+            raise ValueError(kind)
+
+    handle("good")
+    with pytest.raises(ValueError):
+        handle("bad")
+
+    stats = registry.stats()
+    assert stats["tests.test_group_by.handle{kind=bad}"]["errors"] == 1
+    assert stats["tests.test_group_by.handle{kind=good}"]["errors"] == 0
+
+def test_group_by_checks_arguments_and_aggregate():
+    with pytest.raises(ValueError):
+        @profiling(aggregate=Registry(), group_by=["missing"])
+        def handle(endpoint):
+            pass
+
+    with pytest.raises(ValueError):
+        @profiling(group_by=["endpoint"])
+        def handle_logged(endpoint):
+            pass
+
+def test_labels_survive_snapshot_and_exposition():
+    source = Registry()
+
+    @profiling(aggregate=source, group_by=["tenant"])
+    def handle(tenant):
+        pass
+
+    handle("acme")
+    target = Registry()
+    target.merge(source.snapshot())
+
+    assert (
+        'time_logger_calls_total{function="tests.test_group_by.handle",'
+        'tenant="acme"} 1'
+    ) in exposition(target)
+
+def test_non_scalar_labels_are_rendered_bounded():
+    registry = Registry()
+
+    class Loud:
+        def __str__(self):
+            raise RuntimeError("no str")
+
+    @profiling(aggregate=registry, group_by=["value"])
+    def handle(value):
+        return "ok"
+
+    assert handle(Loud()) == "ok"
+    assert handle(list(range(100_000))) == "ok"
+
+    labels = [name for name in registry.stats() if "{value=" in name]
+    assert len(labels) == 2
+    assert all(len(label) < 200 for label in labels)
+
+def test_failing_label_falls_back_to_overflow(capsys):
+    registry = Registry()
+
+    def renderer(value):
+        raise RuntimeError("cannot render")
+
+    @profiling(aggregate=registry, group_by=["value"], renderer=renderer)
+    def handle(value):
+        return "ok"
+
+    assert handle(object()) == "ok"
+
+    stats = registry.stats()
+    assert stats[f"tests.test_group_by.handle{{value={OVERFLOW}}}"][
+        "count"] == 1
+    assert "cannot render" in capsys.readouterr().out
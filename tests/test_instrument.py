@@ -0,0 +1,143 @@
+import logging
+import textwrap
+import types
+from io import StringIO
+
+import pytest
+
+from src.time_logger.instrument import (
+    instrument_class,
+    instrument_module,
+    uninstrument,
+)
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+def make_class():
+    class Service:
+        def handle(self, x):
+            return x + 1
+
+        @staticmethod
+        def parse(text):
+            return int(text)
+
+        @classmethod
+        def create(cls):
+            return cls()
+
+        @property
+        def ready(self):
+            return True
+
+        def _helper(self):
+            return "helper"
+
+        def __repr__(self):
+            return "Service()"
+
+    return Service
+
+def test_method_decorated_in_class_body_uses_qualified_name(logger):
+    logger, log_capture = logger
+
+    class Service:
+        @profiling(logger)
+        def handle(self):
+            pass
+
+    Service().handle()
+    assert "Finished tests.test_instrument.Service.handle()" in log_capture.getvalue()
+
+def test_instrument_class_handles_every_kind_of_method():
+    registry = Registry()
+    Service = make_class()
+
+    names = instrument_class(Service, aggregate=registry)
+
+    assert sorted(names) == ["_helper", "create", "handle", "parse", "ready"]
+    service = Service.create()
+    assert service.handle(1) == 2
+    assert Service.parse("3") == 3
+    assert service.ready is True
+    assert repr(service) == "Service()"
+    assert sorted(registry.stats()) == [
+        "tests.test_instrument.Service.create",
+        "tests.test_instrument.Service.handle",
+        "tests.test_instrument.Service.parse",
+        "tests.test_instrument.Service.ready",
+    ]
+
+def test_instrument_class_include_and_exclude():
+    Service = make_class()
+
+    names = instrument_class(
+        Service, include="*", exclude=["_*", "create"], aggregate=Registry()
+    )
+
+    assert sorted(names) == ["handle", "parse", "ready"]
+
+def test_uninstrument_restores_originals():
+    Service = make_class()
+    original = Service.__dict__["handle"]
+    instrument_class(Service, aggregate=Registry())
+
+    assert Service.__dict__["handle"] is not original
+    assert "handle" in uninstrument(Service)
+    assert Service.__dict__["handle"] is original
+    assert uninstrument(Service) == []
+
+def test_already_profiled_methods_are_left_alone():
+    class Service:
+        @profiling(aggregate=Registry())
+        def handle(self):
+            pass
+
+    profiled = Service.__dict__["handle"]
+    assert instrument_class(Service) == []
+    assert Service.__dict__["handle"] is profiled
+
+def test_instrument_module_skips_imported_names():
+    module = types.ModuleType("fake_service")
+    exec(
+        textwrap.dedent(
+            """
+            from os.path import join
+
+            def fetch(key):
+                return key
+
+            def store(key, value):
+                return value
+
+            class Cache:
+                def get(self, key):
+                    return key
+            """
+        ),
+        module.__dict__,
+    )
+    registry = Registry()
+
+    names = instrument_module(module, exclude="store", aggregate=registry)
+
+    assert sorted(names) == ["Cache.get", "fetch"]
+    module.fetch(1)
+    module.Cache().get(2)
+    assert sorted(registry.stats()) == [
+        "fake_service.Cache.get",
+        "fake_service.fetch",
+    ]
+
+    assert sorted(uninstrument(module)) == ["Cache.get", "fetch"]
+    assert not hasattr(module.fetch, "profiling_switch")
+    assert not hasattr(module.Cache.get, "profiling_switch")
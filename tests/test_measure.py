@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+from src.time_logger.measure import Measures
+from src.time_logger.profile import profiling
+from src.time_logger.sinks import Sink
+
+class ListSink(Sink):
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_measures_rejects_unknown_measure():
+    with pytest.raises(ValueError):
+        Measures(["wall", "gpu"])
+
+def test_wall_only_is_disabled():
+    assert not Measures(("wall",)).enabled
+
+def test_sleeping_call_is_mostly_wait():
+    sink = ListSink()
+
+    @profiling(sink=sink, measure=("wall", "cpu", "thread"))
+    def sleepy():
+        time.sleep(0.05)
+
+    sleepy()
+    measures = sink.records[0].measures
+    assert set(measures) == {"cpu", "thread", "wait"}
+    assert measures["thread"] < 0.02
+    assert measures["wait"] > 0.03
+
+def test_busy_call_is_mostly_cpu():
+    sink = ListSink()
+
+    @profiling(sink=sink, measure=("thread",))
+    def spin():
+        busy(0.05)
+
+    spin()
+    measures = sink.records[0].measures
+    assert measures["thread"] > 0.03
+    assert measures["wait"] < 0.02
+
+def test_cpu_time_of_tiny_calls_stays_within_wall_time():
+    sink = ListSink()
+
+    @profiling(sink=sink, measure=("cpu", "thread"))
+    def test_func():
+        pass
+
+    for _ in range(2000):
+        test_func()
+    wall = sum(record.run_time for record in sink.records)
+    cpu = sum(record.measures["cpu"] for record in sink.records)
+    thread = sum(record.measures["thread"] for record in sink.records)
+    assert cpu < wall * 1.5
+    assert thread < wall * 1.5
+
+def test_measures_in_log_message(capsys):
+    @profiling(measure=("cpu",))
+    def test_func():
+        pass
+
+    test_func()
+    output = capsys.readouterr().out
+    assert "cpu time: " in output
+    assert "wait time: " in output
+
+def test_measures_aggregated():
+    from src.time_logger.stats import Registry
+    registry = Registry()
+
+    @profiling(aggregate=registry, measure=("cpu", "thread"))
+    def test_func():
+        pass
+
+    test_func()
+    summary = registry.stats()["tests.test_measure.test_func"]
+    assert {"cpu_total", "thread_total", "wait_total"} <= set(summary)
+
+@pytest.mark.asyncio
+async def test_async_running_and_suspended_time():
+    sink = ListSink()
+
+    @profiling(sink=sink, measure=("thread",))
+    async def fetch():
+        busy(0.02)
+        await asyncio.sleep(0.05)
+        return 42
+
+    assert await fetch() == 42
+    measures = sink.records[0].measures
+    assert measures["running"] > 0.015
+    assert measures["suspended"] > 0.04
+    assert measures["thread"] < measures["running"] + 0.01
+
+@pytest.mark.asyncio
+async def test_async_exceptions_propagate_through_stepping():
+    @profiling(measure=("cpu",))
+    async def failing():
+        await asyncio.sleep(0)
+        raise KeyError("boom")
+
+    with pytest.raises(KeyError):
+        await failing()
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import tracemalloc
+from io import StringIO
+
+import pytest
+
+from src.time_logger import measure, profile
+from src.time_logger.measure import MemoryTracker, format_bytes
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    tracing = tracemalloc.is_tracing()
+    yield
+    if not tracing:
+        tracemalloc.stop()
+
+def test_tracker_reports_net_and_peak_allocation():
+    tracker = MemoryTracker()
+
+    frame = tracker.start()
+    kept = bytearray(1_000_000)
+    temporary = bytearray(4_000_000)
+    del temporary
+    result = tracker.stop(frame)
+
+    assert 1_000_000 <= result["allocated"] < 1_100_000
+    assert result["peak"] >= 5_000_000
+    assert len(kept) == 1_000_000
+
+def test_nested_calls_fold_peak_into_caller():
+    tracemalloc.start()
+    tracker = MemoryTracker()
+
+    outer = tracker.start()
+    inner = tracker.start()
+    temporary = bytearray(3_000_000)
+    del temporary
+    inner_result = tracker.stop(inner)
+    outer_result = tracker.stop(outer)
+
+    assert inner_result["peak"] >= 3_000_000
+    assert outer_result["peak"] >= 3_000_000
+    assert abs(outer_result["allocated"]) < 100_000
+
+def test_calls_finishing_out_of_order_leave_no_frames_behind():
+    tracker = MemoryTracker(top=3)
+
+    first = tracker.start()
+    second = tracker.start()
+    temporary = bytearray(2_000_000)
+    del temporary
+    first_result = tracker.stop(first)
+    second_result = tracker.stop(second)
+
+    assert first_result["peak"] >= 2_000_000
+    assert second_result["peak"] >= 2_000_000
+    assert not tracker._active
+    assert first.snapshot is None and second.snapshot is None
+
+@pytest.mark.asyncio
+async def test_interleaved_async_calls_leave_no_frames_behind(
+        logger, monkeypatch):
+    logger, log_capture = logger
+    trackers = []
+
+    class Tracker(MemoryTracker):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            trackers.append(self)
+
+    monkeypatch.setattr(profile, "MemoryTracker", Tracker)
+
+    @profiling(logger, track_memory=True, memory_top=3)
+    async def test_func(delay):
+        await asyncio.sleep(delay)
+        return bytearray(1000)
+
+    # Later calls finish first, so calls never stop in LIFO order.
+    await asyncio.gather(*(test_func(0.05 - i * 0.005) for i in range(10)))
+
+    assert log_capture.getvalue().count("allocated: ") == 10
+    assert len(trackers) == 1
+    assert not trackers[0]._active
+
+def test_profiling_logs_and_aggregates_memory(logger):
+    logger, log_capture = logger
+    registry = Registry()
+    kept = []
+
+    @profiling(logger, track_memory=True)
+    def logged():
+        kept.append(bytearray(2_000_000))
+
+    @profiling(aggregate=registry, track_memory=True)
+    def aggregated():
+        kept.append(bytearray(2_000_000))
+
+    logged()
+    aggregated()
+    aggregated()
+
+    assert "allocated: 1.9 MiB, peak: 1.9 MiB" in log_capture.getvalue()
+    summary = registry.stats()["tests.test_memory.aggregated"]
+    assert summary["allocated_total"] >= 4_000_000
+    assert summary["allocated_mean"] >= 2_000_000
+    assert summary["peak_max"] >= 2_000_000
+
+def test_top_allocating_lines_for_large_calls(logger):
+    logger, log_capture = logger
+    kept = []
+
+    @profiling(logger, track_memory=True, memory_top=3, memory_threshold_kb=512)
+    def test_func(size):
+        kept.append(bytearray(size))
+
+    test_func(10)
+    assert "test_memory.py" not in log_capture.getvalue()
+
+    test_func(2_000_000)
+    assert "test_memory.py" in log_capture.getvalue()
+
+def test_without_reset_peak_only_allocation_is_reported(logger, monkeypatch):
+    logger, log_capture = logger
+    monkeypatch.setattr(measure, "_reset_peak", None)
+    registry = Registry()
+
+    @profiling(logger, track_memory=True)
+    def logged():
+        return bytearray(100_000)
+
+    @profiling(aggregate=registry, track_memory=True)
+    def test_func():
+        return bytearray(100_000)
+
+    logged()
+    test_func()
+
+    assert "allocated: " in log_capture.getvalue()
+    assert "peak: " not in log_capture.getvalue()
+    assert registry.stats()[
+        "tests.test_memory.test_func"]["allocated_total"] >= 100_000
+
+def test_tracing_failures_do_not_break_the_call(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, track_memory=True)
+    def test_func():
+        tracemalloc.stop()
+        return "done"
+
+    with pytest.warns(RuntimeWarning, match="track_memory failed"):
+        assert test_func() == "done"
+    assert "allocated" not in log_capture.getvalue()
+
+def test_format_bytes():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(2048) == "2.0 KiB"
+    assert format_bytes(3 * 1024 ** 3) == "3.0 GiB"
+
+def test_tracing_starts_with_the_first_active_call():
+    tracemalloc.stop()
+
+    @profiling(aggregate=Registry(), enabled=False, track_memory=True)
+    def disabled():
+        pass
+
+    @profiling(aggregate=Registry(), track_memory=True)
+    def enabled():
+        pass
+
+    disabled()
+    assert not tracemalloc.is_tracing()
+    enabled()
+    assert tracemalloc.is_tracing()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+from src.time_logger.tree import CallTree, _current_frame
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@patch('time.perf_counter')
+def test_failed_call_is_timed_and_tagged(mock_perf_counter, logger):
+    logger, log_capture = logger
+    mock_perf_counter.side_effect = [0, 2]
+
+    @profiling(logger, log_variables=['x'])
+    def test_func(x):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        test_func(1)
+
+    assert "Failed tests.test_outcomes.test_func() with args: x=1 (execution time: 2.0000 secs, outcome: ValueError)" in log_capture.getvalue()
+
+def test_success_and_failure_stats_kept_separately():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def test_func(fail):
+        if fail:
+            raise TimeoutError()
+
+    test_func(False)
+    test_func(False)
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            test_func(True)
+
+    summary = registry.stats()["tests.test_outcomes.test_func"]
+    assert summary["count"] == 2
+    assert summary["errors"] == 3
+    assert summary["outcomes"] == {"TimeoutError": 3}
+    assert summary["failures"]["count"] == 3
+    assert "errors" in registry.report().splitlines()[0]
+
+@pytest.mark.asyncio
+async def test_cancelled_call_is_tagged():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    async def slow():
+        await asyncio.sleep(10)
+
+    task = asyncio.ensure_future(slow())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    summary = registry.stats()["tests.test_outcomes.slow"]
+    assert summary["count"] == 0
+    assert summary["outcomes"] == {"cancelled": 1}
+
+def test_call_tree_unwinds_after_exception():
+    call_tree = CallTree()
+
+    @profiling(aggregate=Registry(), call_tree=call_tree)
+    def test_func():
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        test_func()
+
+    assert _current_frame.get() is None
+    assert call_tree.nodes()[("tests.test_outcomes.test_func",)]["count"] == 1
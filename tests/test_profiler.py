@@ -2,7 +2,8 @@ import pytest
 import logging
 from io import StringIO
 from unittest.mock import patch, MagicMock
-from src.time_logger.profile import Profiler
+from inspect import signature
+from src.time_logger.profile import Profiler, profiling
 
 @pytest.fixture
 def logger():
@@ -171,3 +172,25 @@ def test_profiler_with_invalid_argument(logger):
     # Ensure no error message is logged
     assert "Error in custom message" not in log_output
     assert "Using default format" not in log_output
+
+def test_format_variables_var_args_and_keyword_only():
+    def test_func(a, *rest, key=5, **extra):
+        pass
+
+    profiler = Profiler(test_func, (1, 2, 3), {'flag': True}, log_all_args=True)
+    formatted_vars = profiler._format_variables()
+    assert formatted_vars == {'a': '1', 'rest': '(2, 3)', 'key': '5', 'extra': "{'flag': True}"}
+
+def test_profiling_resolves_signature_once(logger):
+    logger, log_capture = logger
+
+    def test_func(a, b=2):
+        return a + b
+
+    with patch('src.time_logger.profile.signature', wraps=signature) as mock_signature:
+        profiled = profiling(logger, log_variables=['b'])(test_func)
+        for i in range(3):
+            profiled(i)
+
+    assert mock_signature.call_count == 1
+    assert log_capture.getvalue().count("with args: b=2") == 3
@@ -144,4 +144,38 @@ def test_profiling_with_different_inputs(logger, input_value, expected_output):
     assert result == expected_output
 
     log_output = log_capture.getvalue()
-    assert f"with args: x={input_value}" in log_output
\ No newline at end of file
+    assert f"with args: x={input_value}" in log_output
+def test_profiling_skips_rendering_when_level_disabled(logger):
+    logger, log_capture = logger
+
+    class Expensive:
+        renders = 0
+
+        def __repr__(self):
+            Expensive.renders += 1
+            return "Expensive()"
+
+    @profiling(logger, log_variables=['x'])
+    def test_func(x):
+        return x
+
+    logger.setLevel(logging.WARNING)
+    test_func(Expensive())
+    assert Expensive.renders == 0
+    assert log_capture.getvalue() == ""
+
+    logger.setLevel(logging.INFO)
+    test_func(Expensive())
+    assert Expensive.renders == 1
+    assert "with args: x=Expensive()" in log_capture.getvalue()
+
+def test_profiling_with_custom_level(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, level=logging.WARNING)
+    def test_func():
+        pass
+
+    logger.setLevel(logging.WARNING)
+    test_func()
+    assert "Finished tests.test_profiling_integration.test_func()" in log_capture.getvalue()
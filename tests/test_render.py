@@ -0,0 +1,97 @@
+import logging
+from io import StringIO
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.render import ArgumentRenderer
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+class FakeArray:
+    shape = (1000, 3)
+    dtype = "float64"
+
+    def __repr__(self):
+        raise AssertionError("arrays must not be rendered in full")
+
+def test_large_container_is_truncated_with_length():
+    render = ArgumentRenderer(max_items=3)
+    assert render(list(range(1_000_000))) == "[0, 1, 2, ...] <len=1000000>"
+
+def test_small_values_render_like_repr():
+    render = ArgumentRenderer()
+    for value in [1, "akbar", (2, 3), {"flag": True}, None, [1.5]]:
+        assert render(value) == repr(value)
+
+def test_max_length_and_depth():
+    render = ArgumentRenderer(max_length=20, max_depth=2)
+    assert len(render("x" * 10_000)) <= 20
+    assert render([[[1]]]) == "[[[...]]]"
+
+def test_array_like_summarized_by_shape_and_dtype():
+    render = ArgumentRenderer()
+    assert render(FakeArray()) == "<FakeArray shape=(1000, 3) dtype=float64>"
+    assert render([FakeArray()]) == "[<FakeArray shape=(1000, 3) dtype=float64>]"
+
+def test_non_iterable_shape_falls_back_to_repr():
+    class Shaped:
+        shape = 3
+
+        def __repr__(self):
+            return "Shaped()"
+
+    assert ArgumentRenderer()(Shaped()) == "Shaped()"
+
+def test_registered_summarizer():
+    class Frame:
+        def __init__(self, rows):
+            self.rows = rows
+
+    render = ArgumentRenderer()
+    render.register(Frame, lambda frame: f"<Frame rows={frame.rows}>")
+    assert render(Frame(5)) == "<Frame rows=5>"
+
+def test_immutable_renders_are_cached():
+    render = ArgumentRenderer()
+    text = "y" * 50
+    render(text)
+    render(text)
+    render(1)
+    render(True)
+    info = render._cached_render.cache_info()
+    assert info.hits == 1
+    assert info.misses == 3
+
+def test_large_values_are_not_cached():
+    render = ArgumentRenderer(max_length=100)
+    for value in ("y" * 5000, b"y" * 5000, 10 ** 1000):
+        assert len(render(value)) <= 100
+    assert render._cached_render.cache_info().currsize == 0
+
+def test_profiling_uses_bounded_renderer(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, log_all_args=True, renderer=ArgumentRenderer(max_items=2))
+    def test_func(items, matrix):
+        return len(items)
+
+    test_func(list(range(100)), FakeArray())
+    assert "with args: items=[0, 1, ...] <len=100>, matrix=<FakeArray shape=(1000, 3) dtype=float64>" in log_capture.getvalue()
+
+def test_profiling_with_plain_repr(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, log_variables=['items'], renderer=repr)
+    def test_func(items):
+        pass
+
+    test_func(list(range(50)))
+    assert f"items={list(range(50))!r}" in log_capture.getvalue()
@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import patch
+from src.time_logger.profile import profiling
+from src.time_logger.sampling import RateLimiter, make_sampler
+from src.time_logger.stats import Registry
+
+def test_make_sampler_returns_none_without_options():
+    assert make_sampler() is None
+    assert make_sampler(sample_rate=1) is None
+    assert make_sampler(every_n=1) is None
+
+def test_every_n_sampler():
+    sampler = make_sampler(every_n=3)
+    assert [sampler() for _ in range(7)] == [True, False, False, True, False, False, True]
+
+def test_sample_rate_sampler():
+    with patch('random.random', side_effect=[0.005, 0.5, 0.009]):
+        sampler = make_sampler(sample_rate=0.01)
+        assert [sampler() for _ in range(3)] == [True, False, True]
+
+@pytest.mark.parametrize("options", [
+    {"sample_rate": 0},
+    {"sample_rate": 1.5},
+    {"every_n": 0},
+    {"max_per_second": 0},
+])
+def test_make_sampler_rejects_invalid_options(options):
+    with pytest.raises(ValueError):
+        make_sampler(**options)
+
+@patch('time.monotonic')
+def test_rate_limiter_resets_every_second(mock_monotonic):
+    mock_monotonic.side_effect = [0, 0.1, 0.2, 0.3, 1.2, 1.3]
+    limiter = RateLimiter(max_per_second=2)
+    assert [limiter() for _ in range(5)] == [True, True, False, True, True]
+
+def test_profiling_every_n_only_records_sampled_calls():
+    registry = Registry()
+
+    @profiling(aggregate=registry, every_n=10)
+    def test_func(x):
+        return x * 2
+
+    results = [test_func(i) for i in range(100)]
+    assert results == [i * 2 for i in range(100)]
+    assert registry.stats()["tests.test_sampling.test_func"]["count"] == 10
+
+@pytest.mark.asyncio
+async def test_profiling_async_sampling():
+    registry = Registry()
+
+    @profiling(aggregate=registry, every_n=2)
+    async def test_func(x):
+        return x
+
+    assert [await test_func(i) for i in range(4)] == [0, 1, 2, 3]
+    assert registry.stats()["tests.test_sampling.test_func"]["count"] == 2
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from io import StringIO
+
+import pytest
+
+from src.time_logger.scheduler import Reporter, RollingWindows
+from src.time_logger.stats import Registry
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+def test_windows_cover_their_most_recent_intervals():
+    registry = Registry()
+    windows = RollingWindows(registry, interval=10, windows=(10, 30))
+
+    for _ in range(3):
+        registry.record("f", 0.5)
+    windows.tick()
+    registry.record("f", 0.1)
+    windows.tick()
+
+    summary = windows.summaries()["f"]
+    assert summary["10s"]["count"] == 1
+    assert summary["10s"]["mean"] == pytest.approx(0.1)
+    assert summary["30s"]["count"] == 4
+    assert summary["30s"]["rate"] == pytest.approx(4 / 20)
+    assert summary["30s"]["p90"] == pytest.approx(0.5, rel=0.01)
+
+def test_old_intervals_roll_out_of_windows():
+    registry = Registry()
+    windows = RollingWindows(registry, interval=10, windows=(10, 20))
+
+    registry.record("f", 1.0)
+    windows.tick()
+    windows.tick()
+    assert windows.summaries()["f"]["20s"]["count"] == 1
+
+    windows.tick()
+    assert windows.summaries() == {}
+
+def test_windows_count_errors_and_survive_registry_reset():
+    registry = Registry()
+    windows = RollingWindows(registry, interval=1, windows=(1, 60))
+
+    registry.record("f", 1.0)
+    registry.get("f").add_failure(1.0, "ValueError")
+    windows.tick()
+    registry.reset()
+    registry.record("f", 2.0)
+    windows.tick()
+
+    summary = windows.summaries()["f"]
+    assert summary["1s"]["count"] == 1
+    assert summary["1m"]["count"] == 2
+    assert summary["1m"]["errors"] == 1
+
+def test_windows_must_not_be_shorter_than_interval():
+    with pytest.raises(ValueError):
+        RollingWindows(Registry(), interval=10, windows=(5,))
+
+def test_reporter_emits_one_line_per_function(logger):
+    logger, log_capture = logger
+    registry = Registry()
+    registry.record("pkg.handler", 0.002)
+    registry.record("pkg.handler", 0.004)
+
+    Reporter(registry, interval=10, windows=(10, 60), logger=logger).report()
+
+    lines = [
+        line
+        for line in log_capture.getvalue().splitlines()
+        if line.startswith("pkg.handler")
+    ]
+    assert len(lines) == 1
+    assert "10s: 2 calls (0.2/s), 0 errors" in lines[0]
+    assert "| 1m: 2 calls" in lines[0]
+
+def test_reporter_thread_calls_back_periodically():
+    registry = Registry()
+    registry.record("f", 0.1)
+    reports = []
+
+    reporter = Reporter(
+        registry, interval=0.01, windows=(0.01,), callback=reports.append
+    ).start()
+    time.sleep(0.1)
+    reporter.stop()
+
+    assert reports
+    assert reports[0]["f"]["0.01s"]["count"] == 1
+
+@pytest.mark.asyncio
+async def test_reporter_runs_as_task_inside_event_loop():
+    registry = Registry()
+    registry.record("f", 0.1)
+    reports = []
+
+    reporter = Reporter(
+        registry, interval=0.01, windows=(0.01,), callback=reports.append
+    ).start()
+    assert reporter._thread is None
+    await asyncio.sleep(0.05)
+    reporter.stop()
+
+    assert reports
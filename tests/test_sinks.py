@@ -0,0 +1,256 @@
+import json
+import logging
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.sinks import AsyncSink, BinarySink, JsonLinesSink, read_binary
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_sink_logger')
+    logger.setLevel(logging.INFO)
+    logger.handlers.clear()
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+class SlowHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        time.sleep(0.01)
+        self.threads.add(threading.get_ident())
+        self.records.append(record.getMessage())
+
+def test_async_sink_writes_on_background_thread(logger):
+    logger, _ = logger
+    handler = SlowHandler()
+    logger.addHandler(handler)
+    sink = AsyncSink()
+
+    @profiling(logger, log_variables=['i'], async_sink=sink)
+    def test_func(i):
+        return i
+
+    start = time.perf_counter()
+    for i in range(5):
+        test_func(i)
+    elapsed = time.perf_counter() - start
+    sink.close()
+
+    assert elapsed < 0.05
+    assert len(handler.records) == 5
+    assert "Finished tests.test_sinks.test_func() with args: i=4" in handler.records[-1]
+    assert threading.get_ident() not in handler.threads
+
+def test_async_sink_drop_policy_counts_dropped(logger):
+    logger, log_capture = logger
+    sink = AsyncSink(capacity=2, overflow="drop", flush_interval=10)
+    sink._start = lambda: None  # keep the writer from draining the queue
+
+    @profiling(logger, async_sink=sink)
+    def test_func():
+        pass
+
+    for _ in range(5):
+        test_func()
+
+    assert sink.dropped == 3
+    sink.close()
+    assert log_capture.getvalue().count("Finished") == 2
+
+def test_async_sink_block_policy_keeps_every_record(logger):
+    logger, log_capture = logger
+    sink = AsyncSink(capacity=2, overflow="block", batch_size=1)
+
+    @profiling(logger, async_sink=sink)
+    def test_func():
+        pass
+
+    for _ in range(20):
+        test_func()
+    sink.flush()
+
+    assert sink.dropped == 0
+    assert log_capture.getvalue().count("Finished") == 20
+    sink.close()
+
+def test_async_sink_sample_policy(logger):
+    logger, _ = logger
+    sink = AsyncSink(capacity=100, overflow="sample", sample_every=10)
+    sink._start = lambda: None
+
+    @profiling(logger, async_sink=sink)
+    def test_func():
+        pass
+
+    for _ in range(150):
+        test_func()
+
+    # The first 50 fill half the queue, then one in ten is kept.
+    assert len(sink._queue) == 60
+    assert sink.dropped == 90
+    sink.close()
+
+def test_async_sink_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        AsyncSink(overflow="explode")
+
+def test_json_lines_sink(tmp_path):
+    path = tmp_path / "records.jsonl"
+    sink = JsonLinesSink(str(path))
+
+    @profiling(log_variables=['i'], sink=sink)
+    def test_func(i):
+        return i
+
+    with patch('builtins.print') as mock_print:
+        test_func(1)
+        test_func(2)
+        mock_print.assert_not_called()
+    sink.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["args"] for r in records] == [{"i": "1"}, {"i": "2"}]
+    assert records[0]["function"] == "tests.test_sinks.test_func"
+    assert records[0]["thread_id"] == threading.get_ident()
+    assert records[0]["duration_ns"] >= 0
+
+@patch('time.perf_counter')
+def test_binary_sink_round_trip(mock_perf_counter, tmp_path):
+    mock_perf_counter.side_effect = [1, 1.5, 2, 2.25, 3, 4]
+    path = str(tmp_path / "records.bin")
+    sink = BinarySink(path)
+
+    @profiling(sink=sink)
+    def first():
+        pass
+
+    @profiling(sink=sink)
+    def second():
+        pass
+
+    first()
+    second()
+    first()
+    sink.close()
+
+    functions, columns = read_binary(path, use_numpy=False)
+    assert functions == ["tests.test_sinks.first", "tests.test_sinks.second"]
+    assert list(columns["function_id"]) == [0, 1, 0]
+    assert list(columns["start_ns"]) == [1_000_000_000, 2_000_000_000, 3_000_000_000]
+    assert list(columns["duration_ns"]) == [500_000_000, 250_000_000, 1_000_000_000]
+    assert set(columns["thread_id"]) == {threading.get_ident()}
+
+def test_binary_sink_numpy_reader(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "records.bin")
+    sink = BinarySink(path)
+
+    @profiling(sink=sink)
+    def test_func():
+        pass
+
+    for _ in range(3):
+        test_func()
+    sink.close()
+
+    functions, columns = read_binary(path)
+    assert functions == ["tests.test_sinks.test_func"]
+    assert isinstance(columns["duration_ns"], np.ndarray)
+    assert len(columns["duration_ns"]) == 3
+
+def test_binary_sink_overwrites_previous_session(tmp_path):
+    path = str(tmp_path / "records.bin")
+    sink = BinarySink(path)
+
+    @profiling(sink=sink)
+    def first():
+        pass
+
+    first()
+    first()
+    sink.close()
+    sink = BinarySink(path)
+
+    @profiling(sink=sink)
+    def second():
+        pass
+
+    second()
+    sink.close()
+
+    functions, columns = read_binary(path, use_numpy=False)
+    assert functions == ["tests.test_sinks.second"]
+    assert list(columns["function_id"]) == [0]
+
+def test_async_sink_forwards_to_target(tmp_path):
+    path = tmp_path / "records.jsonl"
+    sink = AsyncSink(target=JsonLinesSink(str(path)))
+
+    @profiling(sink=sink)
+    def test_func():
+        pass
+
+    for _ in range(10):
+        test_func()
+    sink.close()
+
+    assert len(path.read_text().splitlines()) == 10
+
+def test_start_records_do_not_bypass_sinks(tmp_path, logger, capsys):
+    logger, log_capture = logger
+    path = tmp_path / "records.jsonl"
+    sink = JsonLinesSink(str(path))
+
+    @profiling(logger, log_start=True, sink=sink)
+    def test_func():
+        pass
+
+    test_func()
+    sink.close()
+
+    assert log_capture.getvalue() == ""
+    assert capsys.readouterr().out == ""
+    assert len(path.read_text().splitlines()) == 1
+
+def test_exporters_behind_async_sink_skip_start_records(tmp_path, capsys):
+    path = tmp_path / "records.jsonl"
+    sink = AsyncSink(target=JsonLinesSink(str(path)))
+
+    @profiling(log_start=True, async_sink=sink)
+    def test_func():
+        pass
+
+    test_func()
+    sink.close()
+
+    assert "Error" not in capsys.readouterr().out
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["function"] == "tests.test_sinks.test_func"
+
+def test_start_times_use_perf_counter_for_any_clock(tmp_path):
+    path = str(tmp_path / "records.bin")
+    sink = BinarySink(path)
+
+    @profiling(sink=sink, clock="process_time_ns")
+    def test_func():
+        pass
+
+    before = time.perf_counter_ns()
+    test_func()
+    after = time.perf_counter_ns()
+    sink.close()
+
+    _, columns = read_binary(path, use_numpy=False)
+    assert before <= columns["start_ns"][0] <= after
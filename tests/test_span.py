@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling, span
+from src.time_logger.stats import Registry
+from src.time_logger.tree import CallTree
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@patch('time.perf_counter')
+def test_span_context_manager(mock_perf_counter, logger):
+    logger, log_capture = logger
+    mock_perf_counter.side_effect = [0, 0.5]
+
+    with span("parse batch", logger=logger, log_start=True, rows=10):
+        pass
+
+    log_output = log_capture.getvalue()
+    assert "Starting parse batch with args: rows=10" in log_output
+    assert "Finished parse batch with args: rows=10 (execution time: 0.5000 secs)" in log_output
+
+@pytest.mark.asyncio
+async def test_span_async_context_manager(logger):
+    logger, log_capture = logger
+
+    async with span("fetch", logger=logger):
+        await asyncio.sleep(0)
+
+    assert "Finished fetch (execution time:" in log_capture.getvalue()
+
+def test_span_manual_start_stop():
+    registry = Registry()
+    handle = span("callback", aggregate=registry).start()
+    run_time = handle.stop()
+
+    assert run_time >= 0
+    assert handle.run_time == run_time
+    assert registry.stats()["callback"]["count"] == 1
+
+def test_span_stop_without_start():
+    with pytest.raises(RuntimeError):
+        span("never started", aggregate=Registry()).stop()
+
+def test_span_records_failure(logger):
+    logger, log_capture = logger
+
+    with pytest.raises(KeyError):
+        with span("lookup", logger=logger):
+            raise KeyError("missing")
+
+    assert "Failed lookup (execution time:" in log_capture.getvalue()
+    assert "outcome: KeyError" in log_capture.getvalue()
+
+def test_span_inside_profiled_function_call_tree():
+    call_tree = CallTree()
+    registry = Registry()
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    def process(rows):
+        for _ in range(3):
+            with span("hot loop", aggregate=registry, call_tree=call_tree):
+                pass
+
+    process([1, 2])
+
+    nodes = call_tree.nodes()
+    assert nodes[("tests.test_span.process", "hot loop")]["count"] == 3
+    assert registry.stats()["hot loop"]["count"] == 3
+
+def test_span_reused_in_loop():
+    registry = Registry()
+    timer = span("step", aggregate=registry)
+    for _ in range(5):
+        with timer:
+            pass
+    assert registry.stats()["step"]["count"] == 5
@@ -0,0 +1,134 @@
+import sys
+import textwrap
+
+import pytest
+
+from src.time_logger import tree
+from src.time_logger.startup import ImportProfile, main, profile_imports
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    package = tmp_path / "slowapp"
+    package.mkdir()
+    (package / "__init__.py").write_text(
+        textwrap.dedent(
+            """
+            import time
+            from slowapp import models
+            time.sleep(0.02)
+            """
+        )
+    )
+    (package / "models.py").write_text(
+        textwrap.dedent(
+            """
+            import time
+            from src.time_logger import profiling
+
+            @profiling(aggregate=True)
+            def load_schema():
+                time.sleep(0.05)
+
+            load_schema()
+            """
+        )
+    )
+    (package / "__main__.py").write_text("print('started')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "slowapp"
+    for name in list(sys.modules):
+        if name == "slowapp" or name.startswith("slowapp."):
+            del sys.modules[name]
+
+def test_profile_imports_times_nested_modules(app):
+    with profile_imports() as imports:
+        __import__(app)
+
+    rows = {row["name"]: row for row in imports.rows()}
+    package, models = rows["import slowapp"], rows["import slowapp.models"]
+    function = rows["slowapp.models.load_schema"]
+    assert package["total"] >= 0.07
+    assert 0.02 <= package["self"] < package["total"]
+    assert function["total"] >= 0.05
+    assert models["self"] < 0.05
+    assert "import slowapp;import slowapp.models;slowapp.models.load_schema" in (
+        imports.folded()
+    )
+    assert imports.report().splitlines()[1].endswith("import slowapp")
+
+def test_call_tree_functions_run_at_import_are_captured(tmp_path, monkeypatch):
+    own_tree = tree.CallTree()
+    monkeypatch.setattr(tree, "call_tree", own_tree)
+    (tmp_path / "slowmod.py").write_text(
+        textwrap.dedent(
+            """
+            import time
+            from src.time_logger import profiling
+
+            @profiling(aggregate=True, call_tree=True)
+            def work():
+                time.sleep(0.05)
+
+            work()
+            """
+        )
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    with profile_imports() as imports:
+        __import__("slowmod")
+    del sys.modules["slowmod"]
+
+    rows = {row["name"]: row for row in imports.rows()}
+    assert rows["slowmod.work"]["total"] >= 0.05
+    assert rows["import slowmod"]["self"] < 0.05
+    assert "import slowmod;slowmod.work" in imports.folded()
+    assert list(own_tree.nodes()) == [("slowmod.work",)]
+
+def test_profile_imports_restores_import_system(app):
+    meta_path = list(sys.meta_path)
+
+    with profile_imports():
+        module = __import__(app)
+
+    assert sys.meta_path == meta_path
+    assert tree.capturing is None
+    assert type(module.__loader__).__name__ != "_TimedLoader"
+    assert type(module.__spec__.loader).__name__ != "_TimedLoader"
+
+def test_modules_already_imported_are_not_timed(app):
+    __import__(app)
+
+    with ImportProfile() as imports:
+        __import__(app)
+
+    assert imports.rows() == []
+
+def test_startup_command_runs_module_and_writes_folded(
+    app, tmp_path, capsys, monkeypatch
+):
+    monkeypatch.setattr(sys, "argv", list(sys.argv))
+    folded = tmp_path / "startup.folded"
+
+    assert main(["--folded", str(folded), app]) == 0
+
+    captured = capsys.readouterr()
+    assert "started" in captured.out
+    assert "run slowapp" in captured.err
+    assert "import slowapp.models" in captured.err
+    assert folded.read_text().startswith("run slowapp")
+
+@pytest.mark.parametrize(
+    "code, status, message",
+    [("None", 0, ""), ("3", 3, ""), ("'bad config'", 1, "bad config")],
+)
+def test_startup_command_exit_status(
+    tmp_path, capsys, monkeypatch, code, status, message
+):
+    monkeypatch.setattr(sys, "argv", list(sys.argv))
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    script = tmp_path / "exits.py"
+    script.write_text(f"import sys\nsys.exit({code})\n")
+
+    assert main([str(script)]) == status
+    assert capsys.readouterr().err.startswith(message)
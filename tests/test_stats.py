@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+from src.time_logger.profile import profiling
+from src.time_logger.stats import (
+    Accumulator,
+    FunctionStats,
+    Histogram,
+    Registry,
+    _registries,
+    _reset_after_fork,
+    registry as default_registry,
+    spool_at_exit,
+)
+
+def test_function_stats_accumulates():
+    function_stats = FunctionStats("f")
+    for duration in [1.0, 2.0, 3.0, 4.0]:
+        function_stats.add(duration)
+
+    summary = function_stats.summary()
+    assert summary["count"] == 4
+    assert summary["total"] == 10.0
+    assert summary["min"] == 1.0
+    assert summary["max"] == 4.0
+    assert summary["mean"] == 2.5
+    assert summary["variance"] == pytest.approx(5 / 3)
+
+def test_histogram_quantiles_within_relative_error():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.add(i / 1000)
+
+    assert histogram.quantile(0.5) == pytest.approx(0.5, rel=0.05)
+    assert histogram.quantile(0.99) == pytest.approx(0.99, rel=0.05)
+
+def test_histogram_memory_is_fixed():
+    histogram = Histogram()
+    size = len(histogram.counts)
+    for i in range(10000):
+        histogram.add(i * 1e-6)
+    assert len(histogram.counts) == size
+    assert histogram.total == 10000
+
+@patch('time.perf_counter')
+def test_profiling_aggregate_records_instead_of_logging(mock_perf_counter):
+    mock_perf_counter.side_effect = [0, 1, 10, 13]
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def test_func():
+        pass
+
+    with patch('builtins.print') as mock_print:
+        test_func()
+        test_func()
+        mock_print.assert_not_called()
+
+    summary = registry.stats()["tests.test_stats.test_func"]
+    assert summary["count"] == 2
+    assert summary["total"] == 4
+    assert summary["min"] == 1
+    assert summary["max"] == 3
+
+def test_registry_report_sorted_by_total():
+    registry = Registry()
+    registry.record("fast", 0.001)
+    registry.record("slow", 2.0)
+
+    lines = registry.report().splitlines()
+    assert lines[0].startswith("function")
+    assert lines[1].startswith("slow")
+    assert lines[2].startswith("fast")
+
+def test_registry_reset():
+    registry = Registry()
+    registry.record("f", 1.0)
+    registry.reset()
+    assert registry.stats() == {}
+
+def test_function_stats_threads_record_without_losing_calls():
+    function_stats = FunctionStats("f")
+
+    def work():
+        for _ in range(1000):
+            function_stats.add(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = function_stats.summary()
+    assert summary["count"] == 8000
+    assert summary["total"] == pytest.approx(8.0)
+
+def test_exited_threads_fold_into_one_accumulator():
+    function_stats = FunctionStats("f")
+
+    def work():
+        function_stats.add(0.001)
+        function_stats.add_memory(100, 200)
+
+    for _ in range(200):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    function_stats.add(0.001)
+
+    # One for the finished threads, one for this thread.
+    assert len(function_stats._accumulators) == 2
+    summary = function_stats.summary()
+    assert summary["count"] == 201
+    assert summary["allocated_total"] == 20_000
+
+def test_accumulator_merge_matches_single_pass():
+    values = [0.5, 1.0, 1.5, 4.0, 7.0, 0.25]
+    single, left, right = Accumulator(), Accumulator(), Accumulator()
+    for value in values:
+        single.add(value)
+    for value in values[:2]:
+        left.add(value)
+    for value in values[2:]:
+        right.add(value)
+    left.merge(right)
+
+    assert left.count == single.count
+    assert left.mean == pytest.approx(single.mean)
+    assert left.m2 == pytest.approx(single.m2)
+    assert (left.min, left.max) == (single.min, single.max)
+    assert left.histogram.counts == single.histogram.counts
+
+def test_registry_snapshot_merges_into_another_registry():
+    source = Registry()
+    source.record("f", 1.0)
+    source.record("f", 3.0)
+    source.get("f").add_failure(2.0, "ValueError")
+    target = Registry()
+    target.record("f", 2.0)
+
+    target.merge(json.loads(json.dumps(source.snapshot())))
+
+    summary = target.stats()["f"]
+    assert summary["count"] == 3
+    assert summary["total"] == 6.0
+    assert summary["variance"] == pytest.approx(1.0)
+    assert summary["outcomes"] == {"ValueError": 1}
+    assert summary["failures"]["count"] == 1
+
+def _spooled_work(n):
+    default_registry.record("worker", 0.5)
+    return n
+
+def test_process_pool_workers_spool_and_collect(tmp_path):
+    spool = str(tmp_path / "spool")
+    with ProcessPoolExecutor(
+        max_workers=2, initializer=spool_at_exit, initargs=(spool,)
+    ) as executor:
+        assert sorted(executor.map(_spooled_work, range(10))) == list(
+            range(10)
+        )
+
+    registry = Registry()
+    registry.collect(spool)
+
+    assert registry.stats()["worker"]["count"] == 10
+    assert registry.stats()["worker"]["total"] == pytest.approx(5.0)
+    assert os.listdir(spool) == []
+
+def test_histogram_tail_quantiles_within_relative_error():
+    histogram = Histogram()
+    values = [i / 10000 for i in range(1, 10001)]
+    for value in values:
+        histogram.add(value)
+
+    p50, p90, p99, p999 = histogram.quantiles((0.5, 0.9, 0.99, 0.999))
+    error = histogram.relative_error
+    assert p50 == pytest.approx(0.5, rel=error)
+    assert p90 == pytest.approx(0.9, rel=error)
+    assert p99 == pytest.approx(0.99, rel=error)
+    assert p999 == pytest.approx(0.999, rel=error)
+    assert histogram.counts.typecode == "Q"
+
+def test_merged_histograms_keep_their_error_bound():
+    merged, whole = Histogram(), Histogram()
+    parts = [Histogram() for _ in range(4)]
+    for i in range(1, 4001):
+        parts[i % 4].add(i * 1e-4)
+        whole.add(i * 1e-4)
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.counts == whole.counts
+    assert merged.quantile(0.999) == pytest.approx(0.3996, rel=0.01)
+
+def test_histograms_with_different_buckets_do_not_merge():
+    with pytest.raises(ValueError):
+        Histogram().merge(Histogram(growth=1.1))
+
+def test_summary_reports_tail_quantiles():
+    function_stats = FunctionStats("f")
+    for i in range(1, 1001):
+        function_stats.add(i / 1000)
+
+    summary = function_stats.summary()
+    assert summary["p90"] == pytest.approx(0.9, rel=0.01)
+    assert summary["p999"] == pytest.approx(0.999, rel=0.01)
+
+def test_registries_share_one_fork_hook():
+    registry = Registry()
+    registry.record("f", 1.0)
+
+    assert registry in _registries
+    _reset_after_fork()
+    assert registry.stats() == {}
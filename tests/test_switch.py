@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.time_logger import switch
+from src.time_logger.profile import profiling, span
+from src.time_logger.stats import Registry
+
+@pytest.fixture(autouse=True)
+def restore_switches():
+    yield
+    switch.enable()
+    switch.enable("tests")
+    switch.enable("tests.test_switch")
+
+def count(registry, name):
+    return registry.stats().get(name, {}).get("count", 0)
+
+def test_global_disable_and_enable():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def test_func():
+        return 1
+
+    switch.disable()
+    assert test_func() == 1
+    assert not switch.is_enabled()
+    switch.enable()
+    assert test_func() == 1
+
+    assert count(registry, "tests.test_switch.test_func") == 1
+
+def test_module_and_package_disable():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    def test_func():
+        pass
+
+    switch.disable("tests")
+    test_func()
+    assert not switch.is_enabled("tests.test_switch")
+    switch.enable("tests")
+    switch.disable("tests.test_switch")
+    test_func()
+    switch.enable("tests.test_switch")
+    test_func()
+
+    assert count(registry, "tests.test_switch.test_func") == 1
+
+def test_per_function_switch():
+    registry = Registry()
+
+    @profiling(aggregate=registry, enabled=False)
+    def test_func():
+        pass
+
+    test_func()
+    test_func.profiling_switch.enable()
+    test_func()
+    switch.disable()
+    test_func()
+
+    assert count(registry, "tests.test_switch.test_func") == 1
+
+@pytest.mark.asyncio
+async def test_async_function_disabled():
+    registry = Registry()
+
+    @profiling(aggregate=registry)
+    async def test_func():
+        return 2
+
+    switch.disable()
+    assert await test_func() == 2
+    assert count(registry, "tests.test_switch.test_func") == 0
+
+def test_disabled_span_is_a_no_op():
+    registry = Registry()
+
+    switch.disable()
+    with span("block", aggregate=registry) as handle:
+        pass
+
+    assert handle.run_time == 0.0
+    assert registry.stats() == {}
+
+def test_environment_variable_returns_function_unwrapped():
+    code = (
+        "from src.time_logger import profiling\n"
+        "def f(): pass\n"
+        "assert profiling()(f) is f\n"
+    )
+    env = dict(os.environ, TIME_LOGGER="off")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=root, check=True)
@@ -0,0 +1,105 @@
+import logging
+import warnings
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.template import MessageTemplate, TemplateError
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+class Order:
+    def __init__(self, id, lines):
+        self.id = id
+        self.lines = lines
+
+def test_template_parses_fields_once():
+    template = MessageTemplate("Order {order.id} took {elapsed_ms:.1f} ms in {func}")
+    assert template.variables == ["order"]
+    assert template.uses_elapsed
+
+@pytest.mark.parametrize("message", ["{0}", "{}", "{x:{width}}", "{unclosed"])
+def test_template_rejects_unsupported_fields(message):
+    with pytest.raises(TemplateError):
+        MessageTemplate(message)
+
+def test_template_validation():
+    template = MessageTemplate("{a} {b}")
+    template.validate(["a", "b"])
+    template.validate(["a"], accepts_any_keyword=True)
+    with pytest.raises(TemplateError):
+        template.validate(["a"])
+
+@patch('time.perf_counter')
+def test_format_spec_attribute_and_builtins(mock_perf_counter, logger):
+    logger, log_capture = logger
+    mock_perf_counter.side_effect = [0, 0.0125]
+
+    @profiling(logger, custom_message="{func}: order {order.id} line {order.lines[0]!s} in {elapsed_ms:.2f} ms")
+    def process_order(order):
+        pass
+
+    process_order(Order(7, ["milk"]))
+    assert "tests.test_template.process_order: order 7 line milk in 12.50 ms\n" in log_capture.getvalue()
+
+def test_plain_fields_render_like_before(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, custom_message="Processing order {order_id} for customer {customer_name}")
+    def process_order(order_id, customer_name, items):
+        pass
+
+    process_order(500, 'akbar', ['milk'])
+    assert "Processing order 500 for customer 'akbar' (execution time:" in log_capture.getvalue()
+
+def test_unknown_argument_warns_once_at_decoration(logger):
+    logger, log_capture = logger
+
+    with pytest.warns(UserWarning, match="unknown argument"):
+        @profiling(logger, custom_message="Value {missing}")
+        def test_func(x):
+            pass
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        test_func(1)
+        test_func(2)
+
+    assert log_capture.getvalue().count("Finished tests.test_template.test_func()") == 2
+
+def test_unknown_argument_can_be_made_an_error():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        with pytest.raises(UserWarning):
+            @profiling(custom_message="Value {missing}")
+            def test_func(x):
+                pass
+
+def test_elapsed_is_dash_on_start(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, log_start=True, custom_message="{action} {func} {elapsed_ms:.1f}")
+    def test_func():
+        pass
+
+    test_func()
+    assert "Starting tests.test_template.test_func -\n" in log_capture.getvalue()
+
+def test_missing_value_falls_back_per_call(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, custom_message="Order {order.id}")
+    def test_func(order):
+        pass
+
+    test_func(object())
+    assert "Finished tests.test_template.test_func() with args: order=" in log_capture.getvalue()
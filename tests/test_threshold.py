@@ -0,0 +1,94 @@
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+from src.time_logger.threshold import Threshold
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@patch('time.perf_counter')
+def test_only_calls_over_threshold_are_logged(mock_perf_counter, logger):
+    logger, log_capture = logger
+    mock_perf_counter.side_effect = [0, 0.01, 1, 1.2]
+
+    @profiling(logger, threshold_ms=50)
+    def test_func(order_id, retries=3):
+        pass
+
+    test_func(1)
+    test_func(2, retries=5)
+
+    output = log_capture.getvalue()
+    assert "order_id=1" not in output
+    assert (
+        "Finished tests.test_threshold.test_func() with args: order_id=2, "
+        "retries=5 (execution time: 0.2000 secs)"
+    ) in output
+    assert test_func.threshold.calls == 2
+    assert test_func.threshold.slow == 1
+
+@patch('time.perf_counter')
+def test_threshold_with_aggregate_counts_every_call(mock_perf_counter, logger):
+    logger, log_capture = logger
+    mock_perf_counter.side_effect = [0, 0.01, 1, 1.2]
+    registry = Registry()
+
+    @profiling(logger, threshold_ms=50, aggregate=registry)
+    def test_func():
+        pass
+
+    test_func()
+    test_func()
+
+    assert registry.stats()["tests.test_threshold.test_func"]["count"] == 2
+    assert log_capture.getvalue().count("Finished") == 1
+
+def test_percentile_threshold_follows_history():
+    threshold = Threshold(percentile=99, window=100, min_samples=50)
+    for _ in range(99):
+        assert not threshold(0.001)
+
+    assert threshold(0.01)
+    assert not threshold(0.001)
+    assert threshold.cutoff == pytest.approx(0.001)
+
+def test_percentile_threshold_respects_fixed_minimum():
+    threshold = Threshold(
+        threshold_ms=5, percentile=50, window=100, min_samples=10
+    )
+    for _ in range(20):
+        threshold(0.001)
+
+    assert not threshold(0.002)
+    assert threshold(0.006)
+
+def test_threshold_needs_a_limit():
+    with pytest.raises(ValueError):
+        Threshold()
+
+def test_capture_stack_adds_caller(logger):
+    logger, log_capture = logger
+
+    @profiling(logger, threshold_ms=0, capture_stack=True)
+    def test_func():
+        pass
+
+    def calling_site():
+        test_func()
+
+    calling_site()
+
+    output = log_capture.getvalue()
+    assert "in calling_site" in output
+    assert "test_func()" in output
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+
+from src.time_logger.profile import profiling
+from src.time_logger.stats import Registry
+from src.time_logger.tree import CallTree
+
+@pytest.fixture
+def logger():
+    logger = logging.getLogger('test_logger')
+    logger.setLevel(logging.INFO)
+    log_capture = StringIO()
+    handler = logging.StreamHandler(log_capture)
+    logger.addHandler(handler)
+    return logger, log_capture
+
+@patch('time.perf_counter')
+def test_call_tree_self_and_total_time(mock_perf_counter, logger):
+    logger, log_capture = logger
+    # outer starts, inner starts, inner ends, outer ends
+    mock_perf_counter.side_effect = [0, 1, 3, 4]
+    call_tree = CallTree()
+    registry = Registry()
+
+    @profiling(logger, call_tree=call_tree)
+    def inner():
+        pass
+
+    @profiling(logger, call_tree=call_tree)
+    def outer():
+        inner()
+
+    outer()
+
+    nodes = call_tree.nodes()
+    outer_path = ("tests.test_tree.outer",)
+    inner_path = outer_path + ("tests.test_tree.inner",)
+    assert nodes[outer_path] == {"count": 1, "total": 4, "self": 2}
+    assert nodes[inner_path] == {"count": 1, "total": 2, "self": 2}
+
+    log_output = log_capture.getvalue()
+    assert "[depth: 1, parent: tests.test_tree.outer, self time: 2.0000 secs]" in log_output
+    assert "[depth: 0, parent: -, self time: 2.0000 secs]" in log_output
+
+@patch('time.perf_counter')
+def test_call_tree_folded_output(mock_perf_counter, tmp_path):
+    mock_perf_counter.side_effect = [0, 0.25, 0.5, 1]
+    call_tree = CallTree()
+    registry = Registry()
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    def inner():
+        pass
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    def outer():
+        inner()
+
+    outer()
+
+    path = tmp_path / "profile.folded"
+    call_tree.write_folded(str(path))
+    assert path.read_text().splitlines() == [
+        "tests.test_tree.outer 750000",
+        "tests.test_tree.outer;tests.test_tree.inner 250000",
+    ]
+
+def test_call_tree_recursion_depth():
+    call_tree = CallTree()
+    registry = Registry()
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    def factorial(n):
+        return 1 if n <= 1 else n * factorial(n - 1)
+
+    assert factorial(4) == 24
+    depths = sorted(len(path) for path in call_tree.nodes())
+    assert depths == [1, 2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_call_tree_across_await():
+    call_tree = CallTree()
+    registry = Registry()
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    async def child(i):
+        await asyncio.sleep(0.01)
+        return i
+
+    @profiling(aggregate=registry, call_tree=call_tree)
+    async def parent():
+        return await asyncio.gather(child(1), child(2))
+
+    assert await parent() == [1, 2]
+
+    nodes = call_tree.nodes()
+    child_path = ("tests.test_tree.parent", "tests.test_tree.child")
+    assert nodes[child_path]["count"] == 2
+    assert nodes[("tests.test_tree.parent",)]["self"] >= 0